@@ -3,6 +3,7 @@ import requests
 import json
 import pandas as pd
 import os
+import zipfile
 from io import BytesIO
 import fitz  # PyMuPDF for PDF parsing
 import docx  # python-docx for DOCX parsing
@@ -40,6 +41,34 @@ def extract_text_from_file(uploaded_file):
         st.error(f"Unsupported file format: {file_extension}")
         return None
 
+class ZipMember:
+    """A file inside an uploaded zip, readable like a Streamlit upload"""
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+
+    def getvalue(self):
+        return self.data
+
+# Expand uploaded zips into their supported files
+def collect_submission_files(uploaded_files):
+    files = []
+    for uploaded_file in uploaded_files:
+        if uploaded_file.name.lower().endswith('.zip'):
+            if not zipfile.is_zipfile(BytesIO(uploaded_file.getvalue())):
+                st.warning(f"Skipped {uploaded_file.name}: not a valid zip file")
+                continue
+            with zipfile.ZipFile(BytesIO(uploaded_file.getvalue())) as archive:
+                for info in archive.infolist():
+                    name = info.filename
+                    if info.is_dir() or name.startswith('__MACOSX/') or os.path.basename(name).startswith('.'):
+                        continue
+                    if name.split('.')[-1].lower() in ['pdf', 'docx', 'txt']:
+                        files.append(ZipMember(name, archive.read(info)))
+        else:
+            files.append(uploaded_file)
+    return files
+
 # Create sidebar for API keys
 st.sidebar.title("API Settings")
 gemini_api_key = st.sidebar.text_input("Gemini API Key", value="", type="password")
@@ -51,7 +80,7 @@ st.title("📚 Assignment Grader")
 st.markdown("Grade assignments, check for plagiarism, and generate feedback using AI.")
 
 # Create tabs
-tab1, tab2, tab3 = st.tabs(["Grade Assignment", "Check Plagiarism", "Generate Feedback"])
+tab1, tab2, tab3, tab4 = st.tabs(["Grade Assignment", "Check Plagiarism", "Generate Feedback", "Batch Grading"])
 
 # Tab 1: Grade Assignment
 with tab1:
@@ -90,8 +119,9 @@ with tab1:
         else:
             with st.spinner("Grading assignment..."):
                 try:
+                    # One call returns the grade, per-criterion scores and feedback together
                     response = requests.post(
-                        f"{API_BASE_URL}/tools/grade_assignment",
+                        f"{API_BASE_URL}/tools/evaluate",
                         json={
                             "text": assignment_text,
                             "rubric": rubric,
@@ -103,6 +133,18 @@ with tab1:
                     if response.status_code == 200:
                         result = response.json()
                         st.success(f"Assignment Grade: {result['grade']}")
+                        if result["per_criterion_scores"]:
+                            st.subheader("Scores by Criterion")
+                            st.dataframe(pd.DataFrame(result["per_criterion_scores"]))
+                        st.subheader("Feedback")
+                        st.markdown(result["feedback"])
+                        st.download_button(
+                            label="Download Feedback",
+                            data=result["feedback"],
+                            file_name="assignment_feedback.txt",
+                            mime="text/plain",
+                            key="evaluation_download"
+                        )
                     else:
                         st.error(f"Error: {response.status_code} - {response.text}")
                 except Exception as e:
@@ -241,6 +283,107 @@ with tab3:
                 except Exception as e:
                     st.error(f"Error connecting to API: {str(e)}")
 
+# Tab 4: Batch Grading
+with tab4:
+    st.header("Batch Grading")
+
+    batch_files = st.file_uploader(
+        "Upload submissions (PDF, DOCX, TXT) or a zip of a folder of them",
+        type=["pdf", "docx", "txt", "zip"],
+        accept_multiple_files=True,
+        key="batch_files"
+    )
+
+    batch_rubric = st.text_area("Enter grading rubric:", height=150, key="batch_rubric")
+
+    batch_model = st.selectbox(
+        "Select AI model:",
+        ["gemini-1.5-flash-8b", "gemini-2.0-flash"],
+        index=0,
+        key="batch_model"
+    )
+    batch_feedback = st.checkbox("Generate feedback too", value=True, key="batch_feedback")
+    # The server caps this at its BATCH_CONCURRENCY setting (8 by default)
+    batch_concurrency = st.slider("Submissions graded at once", min_value=1, max_value=8, value=8)
+
+    if st.button("Grade All", key="batch_btn"):
+        submissions = []
+        skipped = []
+        for submission_file in collect_submission_files(batch_files or []):
+            # One unreadable file shouldn't stop the rest of the batch
+            try:
+                text = extract_text_from_file(submission_file)
+            except Exception as e:
+                skipped.append(f"{submission_file.name}: {e}")
+                continue
+            if text:
+                submissions.append({"name": submission_file.name, "text": text})
+            else:
+                skipped.append(f"{submission_file.name}: no text found")
+        if skipped:
+            st.warning(f"Skipped {len(skipped)} files:\n" + "\n".join(f"- {item}" for item in skipped))
+
+        if not submissions or not batch_rubric:
+            st.error("Please provide submissions and a rubric.")
+        else:
+            progress = st.progress(0.0, text=f"Grading {len(submissions)} submissions...")
+            table = st.empty()
+            rows = []
+            try:
+                with requests.post(
+                    f"{API_BASE_URL}/tools/grade_batch",
+                    json={
+                        "submissions": submissions,
+                        "rubric": batch_rubric,
+                        "model": batch_model,
+                        "include_feedback": batch_feedback,
+                        "concurrency": batch_concurrency,
+                        "gemini_api_key": gemini_api_key
+                    },
+                    stream=True,
+                    timeout=(10, 300)
+                ) as response:
+                    if response.status_code != 200:
+                        st.error(f"Error: {response.status_code} - {response.text}")
+                    else:
+                        for line in response.iter_lines():
+                            if not line:
+                                continue
+                            event = json.loads(line)
+                            if event["type"] == "start":
+                                progress.progress(
+                                    0.0,
+                                    text=f"Grading {event['total']} submissions, {event['concurrency']} at a time..."
+                                )
+                            elif event["type"] == "result":
+                                scores = event.get("per_criterion_scores") or []
+                                rows.append({
+                                    "name": event["name"],
+                                    "grade": event.get("grade", ""),
+                                    "scores": "; ".join(f"{s['criterion']}: {s['score']:g}/{s['max_score']:g}" for s in scores),
+                                    "feedback": event.get("feedback", ""),
+                                    "error": event.get("error", "")
+                                })
+                                table.dataframe(pd.DataFrame(rows))
+                                progress.progress(
+                                    event["completed"] / event["total"],
+                                    text=f"Graded {event['completed']} of {event['total']}"
+                                )
+                            elif event["type"] == "done":
+                                progress.progress(1.0, text=f"Done in {event['elapsed']}s")
+                                if event["failed"]:
+                                    st.warning(f"{event['failed']} submissions could not be graded.")
+            except Exception as e:
+                st.error(f"Error connecting to API: {str(e)}")
+
+            if rows:
+                st.download_button(
+                    label="Download Results (CSV)",
+                    data=pd.DataFrame(rows).to_csv(index=False),
+                    file_name="batch_grades.csv",
+                    mime="text/csv"
+                )
+
 # Footer
 st.markdown("---")
 st.markdown("Assignment Grader Tool - Powered by AI")
@@ -0,0 +1,108 @@
+"""Load test for the grading and plagiarism endpoints against stub backends.
+
+1. Start the stub (Gemini generateContent and Google Custom Search, each
+   answering after a delay):
+       python loadtest.py stub --port 8100 --delay 0.5
+2. Start the grader pointed at it:
+       GEMINI_BASE_URL=http://localhost:8100 GOOGLE_SEARCH_URL=http://localhost:8100/customsearch/v1 \
+           uvicorn server:app --port 8000
+3. Measure throughput at increasing concurrency:
+       python loadtest.py run --url http://localhost:8000 --requests 32
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+RUBRIC = "A: Excellent analysis and well-structured. B: Good analysis but some flaws. C: Basic understanding shown."
+TEXT = "The industrial revolution changed how people worked and lived. " * 20
+EVALUATION = {
+    "grade": "B+",
+    "feedback": "Clear argument; support the claims with more evidence.",
+    "per_criterion_scores": [
+        {"criterion": "Analysis", "score": 8, "max_score": 10, "comment": "Good depth."},
+        {"criterion": "Structure", "score": 9, "max_score": 10, "comment": "Well organised."},
+    ],
+}
+
+
+def stub_app(delay: float):
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.post("/v1beta/models/{model}:generateContent")
+    async def generate_content(model: str, body: dict):
+        await asyncio.sleep(delay)
+        # Schema-constrained calls ask for JSON
+        structured = body.get("generationConfig", {}).get("responseMimeType") == "application/json"
+        text = json.dumps(EVALUATION) if structured else "B+"
+        return {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+            }],
+            "usageMetadata": {"promptTokenCount": 200, "candidatesTokenCount": 2, "totalTokenCount": 202},
+        }
+
+    @app.get("/customsearch/v1")
+    async def custom_search(q: str = ""):
+        await asyncio.sleep(delay)
+        return {"items": [{"link": f"https://example.com/{i}", "snippet": q[:100]} for i in range(5)]}
+
+    return app
+
+
+async def run(url: str, endpoint: str, total: int, concurrency: int) -> float:
+    payload = {
+        "/tools/grade_assignment": {"text": TEXT, "rubric": RUBRIC, "gemini_api_key": "stub"},
+        "/tools/evaluate": {"text": TEXT, "rubric": RUBRIC, "gemini_api_key": "stub"},
+        "/tools/check_plagiarism": {"text": TEXT, "google_api_key": "stub", "search_engine_id": "stub"},
+    }[endpoint]
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120.0) as client:
+
+        async def one():
+            async with semaphore:
+                response = await client.post(endpoint, json=payload)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    stub = commands.add_parser("stub")
+    stub.add_argument("--port", type=int, default=8100)
+    stub.add_argument("--delay", type=float, default=0.5)
+
+    load = commands.add_parser("run")
+    load.add_argument("--url", default="http://localhost:8000")
+    load.add_argument("--requests", type=int, default=32)
+    load.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    load.add_argument(
+        "--endpoint",
+        choices=["/tools/grade_assignment", "/tools/evaluate", "/tools/check_plagiarism"],
+        default="/tools/grade_assignment",
+    )
+
+    args = parser.parse_args()
+    if args.command == "stub":
+        import uvicorn
+
+        uvicorn.run(stub_app(args.delay), host="127.0.0.1", port=args.port)
+        return
+
+    for concurrency in args.concurrency:
+        elapsed = asyncio.run(run(args.url, args.endpoint, args.requests, concurrency))
+        print(f"concurrency={concurrency:<4} {args.requests / elapsed:7.2f} req/s ({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,23 @@
 from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 import uvicorn
 import openai
 import os
 import sys
+import json
+import time
+import random
+import asyncio
 from pydantic import BaseModel
 from typing import List, Optional
-import requests
+import httpx
+from contextlib import asynccontextmanager
 from functools import lru_cache
+from collections import OrderedDict
 import logging
 from google import genai
+from google.genai import types
+from google.genai import errors as genai_errors
 
 # Logging setup
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,6 +29,15 @@ class Settings:
         self.gemini_api_key = ""
         self.google_api_key = ""
         self.search_engine_id = ""
+        # Overridable so the grader can be load tested against stub backends
+        self.gemini_base_url = os.getenv("GEMINI_BASE_URL")
+        self.search_url = os.getenv("GOOGLE_SEARCH_URL", "https://www.googleapis.com/customsearch/v1")
+        # Batch grading: submissions graded at once, and retries of rate-limited Gemini calls
+        self.batch_concurrency = int(os.getenv("BATCH_CONCURRENCY", "8"))
+        self.batch_max_submissions = int(os.getenv("BATCH_MAX_SUBMISSIONS", "500"))
+        self.gemini_max_retries = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+        # Distinct API keys whose Gemini clients are kept open
+        self.gemini_client_cache_size = int(os.getenv("GEMINI_CLIENT_CACHE_SIZE", "4"))
 
 # Log config
 settings = Settings()
@@ -35,6 +53,7 @@ def get_settings() -> Settings:
 # Pydantic Models
 class BaseRequest(BaseModel):
     openai_api_key: Optional[str] = None
+    gemini_api_key: Optional[str] = None
     google_api_key: Optional[str] = None
     search_engine_id: Optional[str] = None
 
@@ -53,6 +72,28 @@ class GradeRequest(BaseRequest):
 class GradeResponse(BaseModel):
     grade: str
 
+class CriterionScore(BaseModel):
+    criterion: str
+    score: float
+    max_score: float
+    comment: str
+
+class EvaluationResponse(BaseModel):
+    grade: str
+    feedback: str
+    per_criterion_scores: List[CriterionScore]
+
+class Submission(BaseModel):
+    name: str
+    text: str
+
+class BatchGradeRequest(BaseRequest):
+    submissions: List[Submission]
+    rubric: str
+    model: Optional[str] = "gemini-1.5-flash-8b"
+    include_feedback: bool = True
+    concurrency: Optional[int] = None
+
 class PlagirismResult(BaseModel):
     url: str
     similarity: int
@@ -60,11 +101,86 @@ class PlagirismResult(BaseModel):
 class PlagiarismResponse(BaseModel):
     results: List[PlagirismResult]
 
+# Shared clients, created once so requests reuse connections and never block the event loop
+http_client: Optional[httpx.AsyncClient] = None
+# API key -> async Gemini client, least recently used first; keys come from
+# callers, so only the few most recent ones keep a client (and its connections)
+gemini_clients: OrderedDict = OrderedDict()
+# id(client) -> number of requests using it, and evicted clients still in use;
+# those are closed when their last request finishes
+gemini_clients_in_use: dict = {}
+evicted_gemini_clients: dict = {}
+
+async def close_gemini_client(client):
+    """Release the connection pools of an async Gemini client"""
+    try:
+        aclose = getattr(client, "aclose", None)
+        if aclose is not None:
+            await aclose()
+            return
+        # older google-genai releases have no close method; close its httpx clients directly
+        api_client = getattr(client, "_api_client", None)
+        async_http = getattr(api_client, "_async_httpx_client", None)
+        sync_http = getattr(api_client, "_httpx_client", None)
+        if async_http is not None:
+            await async_http.aclose()
+        if sync_http is not None:
+            sync_http.close()
+    except Exception as e:
+        logger.warning(f"Error closing Gemini client: {e}")
+
+@asynccontextmanager
+async def gemini_client(api_key: str):
+    """Async Gemini client for an API key, created on first use and kept open while in use"""
+    client = gemini_clients.get(api_key)
+    if client is not None:
+        gemini_clients.move_to_end(api_key)
+    else:
+        settings = get_settings()
+        http_options = types.HttpOptions(base_url=settings.gemini_base_url) if settings.gemini_base_url else None
+        client = gemini_clients[api_key] = genai.Client(api_key=api_key, http_options=http_options).aio
+    gemini_clients_in_use[id(client)] = gemini_clients_in_use.get(id(client), 0) + 1
+
+    while len(gemini_clients) > max(1, get_settings().gemini_client_cache_size):
+        _, evicted = gemini_clients.popitem(last=False)
+        if id(evicted) in gemini_clients_in_use:
+            evicted_gemini_clients[id(evicted)] = evicted
+        else:
+            await close_gemini_client(evicted)
+
+    try:
+        yield client
+    finally:
+        gemini_clients_in_use[id(client)] -= 1
+        if not gemini_clients_in_use[id(client)]:
+            del gemini_clients_in_use[id(client)]
+            evicted = evicted_gemini_clients.pop(id(client), None)
+            if evicted is not None:
+                await close_gemini_client(evicted)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global http_client
+    http_client = httpx.AsyncClient(
+        timeout=10,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+    )
+    try:
+        yield
+    finally:
+        await http_client.aclose()
+        http_client = None
+        for client in [*gemini_clients.values(), *evicted_gemini_clients.values()]:
+            await close_gemini_client(client)
+        gemini_clients.clear()
+        evicted_gemini_clients.clear()
+
 # FastAPI init
 app = FastAPI(
     title="Assignment Grader API",
     description="Grade and check assignments using AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 @app.get("/")
@@ -110,9 +226,8 @@ async def check_plagiarism(request: PlagiarismRequest, settings: Settings = Depe
         if not text:
             raise HTTPException(status_code=400, detail="Text cannot be empty.")
         query = text[:300]
-        url = f"https://www.googleapis.com/customsearch/v1"
         params = {"key": keys["google_api_key"], "cx": keys["search_id"], "q": query}
-        response = requests.get(url, params=params, timeout=10)
+        response = await http_client.get(settings.search_url, params=params)
         if response.status_code != 200:
             raise HTTPException(status_code=response.status_code, detail=f"Google API error: {response.text}")
         data = response.json()
@@ -130,28 +245,82 @@ async def check_plagiarism(request: PlagiarismRequest, settings: Settings = Depe
         raise HTTPException(status_code=500, detail=str(e))
 
 # Gemini completion
-async def call_gemini_api(prompt: str, model: str, api_key: str) -> str:
+RETRYABLE_STATUS_CODES = {429, 500, 503}
+# Longest wait between retries, whatever the server asks for
+MAX_RETRY_DELAY = 30.0
 
+def retry_delay(error: genai_errors.APIError, attempt: int) -> float:
+    """Seconds to wait before retrying; honours Retry-After, otherwise exponential backoff with jitter"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
     try:
+        return min(max(float(headers.get("retry-after")), 0.0), MAX_RETRY_DELAY)
+    except (TypeError, ValueError):
+        return min(2 ** attempt, MAX_RETRY_DELAY) * random.uniform(0.5, 1.0)
 
-        if not prompt.strip():
-            raise HTTPException(status_code=400, detail="Prompt cannot be empty.")
-        
-        if not model:
-            raise HTTPException(status_code=400, detail="Model cannot be empty.")
-        
-        client = genai.Client(api_key=api_key)
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt,
-        )
-    
-        return response.text.strip()
+async def generate_content(prompt: str, model: str, api_key: str, config: Optional[types.GenerateContentConfig] = None):
+    if not prompt.strip():
+        raise HTTPException(status_code=400, detail="Prompt cannot be empty.")
     
+    if not model:
+        raise HTTPException(status_code=400, detail="Model cannot be empty.")
     
+    max_retries = get_settings().gemini_max_retries
+    for attempt in range(max_retries + 1):
+        try:
+            async with gemini_client(api_key) as client:
+                return await client.models.generate_content(
+                    model="gemini-2.0-flash",
+                    contents=prompt,
+                    config=config,
+                )
+        except genai_errors.APIError as e:
+            if e.code not in RETRYABLE_STATUS_CODES or attempt == max_retries:
+                raise
+            delay = retry_delay(e, attempt)
+            logger.warning(f"Gemini returned {e.code}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+async def call_gemini_api(prompt: str, model: str, api_key: str) -> str:
+    try:
+        response = await generate_content(prompt, model, api_key)
+        return response.text.strip()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Gemini API error: {str(e)}")
+
+async def call_gemini_structured(prompt: str, model: str, api_key: str, schema: type[BaseModel]) -> BaseModel:
+    """Gemini call constrained to return JSON matching `schema`"""
+    config = types.GenerateContentConfig(response_mime_type="application/json", response_schema=schema)
+    try:
+        response = await generate_content(prompt, model, api_key, config)
+        if isinstance(response.parsed, schema):
+            return response.parsed
+        return schema.model_validate_json(response.text)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gemini API error: {str(e)}")
 
+# The rubric comes first, so prompts for one rubric share a prefix the model can cache
+def grade_prompt(rubric: str, text: str) -> str:
+    return f"""You are an expert educator. Grade the following assignment based on the provided rubric. Return only the grade (e.g., A, B+, C-).
+
+Rubric:
+{rubric}
+
+Assignment:
+{text}
+
+Grade:"""
+
+def feedback_prompt(rubric: str, text: str) -> str:
+    return f"""Provide constructive feedback for the assignment below based on the rubric:
+
+Rubric:
+{rubric}
+
+Assignment:
+{text}
+
+Feedback:"""
+
 @app.post("/tools/grade_assignment", response_model=GradeResponse)
 async def grade_assignment(request: GradeRequest, settings: Settings = Depends(get_settings)):
     if not request.text.strip() or not request.rubric.strip():
@@ -161,16 +330,7 @@ async def grade_assignment(request: GradeRequest, settings: Settings = Depends(g
     if not keys["gemini_api_key"]:
         raise HTTPException(status_code=400, detail="Gemini API key not configured.")
     
-    prompt = f"""You are an expert educator. Grade the following assignment based on the provided rubric. Return only the grade (e.g., A, B+, C-).
-
-Rubric:
-{request.rubric}
-
-Assignment:
-{request.text}
-
-Grade:"""
-    
+    prompt = grade_prompt(request.rubric, request.text)
     grade = await call_gemini_api(prompt, request.model, keys["gemini_api_key"])
     return GradeResponse(grade=grade)
 
@@ -181,17 +341,90 @@ async def generate_feedback(request: GradeRequest, settings: Settings = Depends(
     keys = get_api_keys(request, settings)
     if not keys["gemini_api_key"]:
         raise HTTPException(status_code=400, detail="Gemini API key not configured.")
-    prompt = f"""Provide constructive feedback for the assignment below based on the rubric:
+    prompt = feedback_prompt(request.rubric, request.text)
+    feedback = await call_gemini_api(prompt, request.model, keys["gemini_api_key"])
+    return {"feedback": feedback}
 
-Assignment:
-{request.text}
+def evaluation_prompt(rubric: str, text: str) -> str:
+    return f"""You are an expert educator. Evaluate the following assignment against the provided rubric.
+Score each rubric criterion with a short comment, give an overall grade (e.g., A, B+, C-) consistent with those scores, and write constructive feedback for the student.
 
 Rubric:
-{request.rubric}
+{rubric}
 
-Feedback:"""
-    feedback = await call_gemini_api(prompt, request.model, keys["gemini_api_key"])
-    return {"feedback": feedback}
+Assignment:
+{text}"""
+
+@app.post("/tools/evaluate", response_model=EvaluationResponse)
+async def evaluate_assignment(request: GradeRequest, settings: Settings = Depends(get_settings)):
+    """Grade, per-criterion scores and feedback from a single model call"""
+    if not request.text.strip() or not request.rubric.strip():
+        raise HTTPException(status_code=400, detail="Text and rubric cannot be empty.")
+    keys = get_api_keys(request, settings)
+    if not keys["gemini_api_key"]:
+        raise HTTPException(status_code=400, detail="Gemini API key not configured.")
+    prompt = evaluation_prompt(request.rubric, request.text)
+    return await call_gemini_structured(prompt, request.model, keys["gemini_api_key"], EvaluationResponse)
+
+async def grade_submission(index: int, submission: Submission, request: BatchGradeRequest, api_key: str) -> dict:
+    result = {"type": "result", "index": index, "name": submission.name}
+    if not submission.text.strip():
+        return {**result, "error": "Submission text is empty."}
+    try:
+        if request.include_feedback:
+            prompt = evaluation_prompt(request.rubric, submission.text)
+            evaluation = await call_gemini_structured(prompt, request.model, api_key, EvaluationResponse)
+            return {**result, **evaluation.model_dump()}
+        grade = await call_gemini_api(grade_prompt(request.rubric, submission.text), request.model, api_key)
+    except HTTPException as e:
+        return {**result, "error": e.detail}
+    return {**result, "grade": grade}
+
+@app.post("/tools/grade_batch")
+async def grade_batch(request: BatchGradeRequest, settings: Settings = Depends(get_settings)):
+    """Grade many submissions against one rubric, streaming results as NDJSON.
+
+    A `start` line is followed by one `result` line per submission in completion
+    order, each carrying `completed`/`total` progress, and a final `done` line.
+    """
+    if not request.rubric.strip():
+        raise HTTPException(status_code=400, detail="Rubric cannot be empty.")
+    if not request.submissions:
+        raise HTTPException(status_code=400, detail="No submissions to grade.")
+    if len(request.submissions) > settings.batch_max_submissions:
+        raise HTTPException(status_code=400, detail=f"At most {settings.batch_max_submissions} submissions per batch.")
+    keys = get_api_keys(request, settings)
+    if not keys["gemini_api_key"]:
+        raise HTTPException(status_code=400, detail="Gemini API key not configured.")
+
+    concurrency = max(1, min(request.concurrency or settings.batch_concurrency, settings.batch_concurrency))
+    semaphore = asyncio.Semaphore(concurrency)
+    total = len(request.submissions)
+
+    async def bounded(index: int, submission: Submission) -> dict:
+        async with semaphore:
+            return await grade_submission(index, submission, request, keys["gemini_api_key"])
+
+    async def results():
+        start = time.perf_counter()
+        yield json.dumps({"type": "start", "total": total, "concurrency": concurrency}) + "\n"
+        tasks = [asyncio.create_task(bounded(i, s)) for i, s in enumerate(request.submissions)]
+        completed = failed = 0
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                completed += 1
+                failed += "error" in result
+                yield json.dumps({**result, "completed": completed, "total": total}) + "\n"
+        finally:
+            # The client went away; don't keep grading for nobody
+            for task in tasks:
+                task.cancel()
+        elapsed = time.perf_counter() - start
+        logger.info(f"Graded batch of {total} in {elapsed:.1f}s ({failed} failed)")
+        yield json.dumps({"type": "done", "completed": completed, "failed": failed, "elapsed": round(elapsed, 2)}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
 
 if __name__ == "__main__":
     logger.info("Assignment Grader API running at http://localhost:8088")
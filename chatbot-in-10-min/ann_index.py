@@ -0,0 +1,128 @@
+import os
+import pickle
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+# Supported index types:
+#   flat  - exact search, best recall, linear scan cost
+#   ivf   - inverted file, probes `nprobe` of `nlist` clusters
+#   ivfpq - inverted file with product-quantized codes (small memory footprint)
+#   hnsw  - graph based, tuned with `ef_search`
+INDEX_TYPES = ("flat", "ivf", "ivfpq", "hnsw")
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "index.pkl"
+
+
+def build_index(vectors, index_type="flat", nlist=None, pq_m=16, pq_bits=8,
+                hnsw_m=32, ef_construction=200):
+    """Build (and train, if needed) a FAISS index over `vectors`.
+
+    Product quantization needs at least 2**pq_bits training vectors, so for a
+    smaller corpus "ivfpq" falls back to a plain "ivf" index.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, dim = vectors.shape
+
+    if index_type == "ivfpq" and n < 2 ** pq_bits:
+        print(f"Only {n} vectors, fewer than the {2 ** pq_bits} ivfpq needs to train; using ivf")
+        index_type = "ivf"
+    if index_type in ("ivf", "ivfpq") and nlist is not None and nlist > n:
+        raise ValueError(f"nlist={nlist} is larger than the number of vectors ({n})")
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        # Rule of thumb: ~sqrt(n) clusters, with at least 39 training points each
+        nlist = nlist or max(1, min(int(4 * np.sqrt(n)), n // 39))
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            if dim % pq_m != 0:
+                raise ValueError(f"Vector dimension {dim} must be divisible by pq_m={pq_m}")
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_bits)
+        index.train(vectors)
+
+    index.add(vectors)
+    return index
+
+
+def tune_index(index, nprobe=None, ef_search=None):
+    """Set the query-time recall/latency knobs of an index."""
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass  # not an IVF index
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+    return index
+
+
+def save_index(index, path):
+    faiss.write_index(index, path)
+
+
+def load_index(path, mmap=True):
+    """Load an index from disk.
+
+    With `mmap`, the inverted lists of ivf and ivfpq indexes are memory-mapped
+    instead of read into RAM. FAISS has no mmap support for flat and hnsw
+    indexes, so those are always read fully into memory.
+    """
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    return faiss.read_index(path, flags)
+
+
+def build_vector_store(chunks, embeddings, ids=None, vectors=None, index_type="flat",
+                       nprobe=None, ef_search=None, **index_params):
+    """Wrap a tuned FAISS index over `chunks` in a LangChain vector store.
+
+    The chunks are embedded here unless precomputed `vectors` are passed in.
+    """
+    if vectors is None:
+        vectors = embeddings.embed_documents([chunk.page_content for chunk in chunks])
+    vectors = np.array(vectors, dtype="float32")
+
+    index = build_index(vectors, index_type=index_type, **index_params)
+    tune_index(index, nprobe=nprobe, ef_search=ef_search)
+
+    ids = ids or [str(i) for i in range(len(chunks))]
+    docstore = InMemoryDocstore(dict(zip(ids, chunks)))
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=dict(enumerate(ids)),
+    )
+
+
+def save_vector_store(vector_store, folder):
+    os.makedirs(folder, exist_ok=True)
+    save_index(vector_store.index, os.path.join(folder, INDEX_FILE))
+    with open(os.path.join(folder, DOCSTORE_FILE), "wb") as f:
+        pickle.dump((vector_store.docstore, vector_store.index_to_docstore_id), f)
+
+
+def load_vector_store(folder, embeddings, mmap=True, nprobe=None, ef_search=None):
+    """Load a vector store saved with `save_vector_store` without re-embedding anything."""
+    index = load_index(os.path.join(folder, INDEX_FILE), mmap=mmap)
+    tune_index(index, nprobe=nprobe, ef_search=ef_search)
+    with open(os.path.join(folder, DOCSTORE_FILE), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
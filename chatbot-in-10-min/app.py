@@ -1,72 +1,151 @@
 import os 
+import asyncio
+import logging
+import time
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_community.vectorstores import FAISS
 from langchain_google_genai.embeddings import GoogleGenerativeAIEmbeddings
-from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
+from langchain.chains.question_answering.stuff_prompt import PROMPT_SELECTOR
+from langchain_core.messages import get_buffer_string
 import gradio as gr
+from index_cache import load_or_build_vector_store
+from ingest import SUPPORTED_EXTENSIONS, ingest
+from session_memory import SessionMemoryStore
 
 # Load environment variables
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Vector index settings (see ann_index.INDEX_TYPES); "flat" is exact search
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+INDEX_NPROBE = int(os.getenv("INDEX_NPROBE", "8"))
+INDEX_EF_SEARCH = int(os.getenv("INDEX_EF_SEARCH", "64"))
+
 # Initialize the Gemini model
 llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash",api_key=GOOGLE_API_KEY)
 
+# Document splitting settings
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+EMBEDDING_MODEL = "models/embedding-001"
+INDEX_CACHE_DIR = os.getenv("INDEX_CACHE_DIR", "faiss_index")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+
+text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
 # Function to process documents
 def process_documents(file_paths):
-    documents = []
-    
-    for file_path in file_paths:
-        if file_path.endswith('.pdf'):
-            loader = PyPDFLoader(file_path)
-        elif file_path.endswith('.txt'):
-            loader = TextLoader(file_path)
-        else:
-            continue
-            
-        documents.extend(loader.load())
-    
-    # Split documents into chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    chunks = text_splitter.split_documents(documents)
-    
-    # Create embeddings and vector store
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=os.getenv("GOOGLE_API_KEY"))
-    vector_store = FAISS.from_documents(chunks, embeddings)
+    file_paths = [path for path in file_paths if path.endswith(SUPPORTED_EXTENSIONS)]
+
+    # Create embeddings and vector store, re-embedding only new or changed files
+    embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=os.getenv("GOOGLE_API_KEY"))
+
+    def ingest_files(paths):
+        return ingest(paths, text_splitter, embeddings, batch_size=EMBED_BATCH_SIZE, embed_workers=EMBED_WORKERS)
+
+    vector_store = load_or_build_vector_store(
+        file_paths,
+        embeddings,
+        ingest_files,
+        cache_dir=INDEX_CACHE_DIR,
+        settings={
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "embedding_model": EMBEDDING_MODEL,
+            "index_type": INDEX_TYPE,
+        },
+        nprobe=INDEX_NPROBE,
+        ef_search=INDEX_EF_SEARCH,
+    )
     
     return vector_store
 
-# Process your documents
-document_paths = [os.path.join("documents", f) for f in os.listdir("documents")]
-vector_store = process_documents(document_paths)
+# Conversation memory settings
+MEMORY_MODE = os.getenv("MEMORY_MODE", "window")  # "window" or "summary"
+MEMORY_WINDOW = int(os.getenv("MEMORY_WINDOW", "5"))
+SESSION_IDLE_TIMEOUT = int(os.getenv("SESSION_IDLE_TIMEOUT", "1800"))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "1000"))
 
-# Set up conversation memory
-memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-
-# Create the conversation chain
-conversation_chain = ConversationalRetrievalChain.from_llm(
+# Set up conversation memory, one per Gradio session
+sessions = SessionMemoryStore(
+    mode=MEMORY_MODE,
+    window=MEMORY_WINDOW,
     llm=llm,
-    retriever=vector_store.as_retriever(),
-    memory=memory
+    idle_timeout=SESSION_IDLE_TIMEOUT,
+    max_sessions=MAX_SESSIONS,
 )
 
-# Function to generate response
-def generate_response(message, history):
-    response = conversation_chain({"question": message})
-    return response["answer"]
+# Request limits: handlers running at once, requests waiting in the queue,
+# and LLM calls in flight across all handlers
+CONCURRENCY_LIMIT = int(os.getenv("CONCURRENCY_LIMIT", "8"))
+QUEUE_MAX_SIZE = int(os.getenv("QUEUE_MAX_SIZE", "64"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+
+llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+qa_prompt = PROMPT_SELECTOR.get_prompt(llm)
+
+# Function to rewrite a follow-up into a standalone question
+async def condense_question(message, chat_history):
+    if not chat_history:
+        return message
+    prompt = CONDENSE_QUESTION_PROMPT.format(chat_history=get_buffer_string(chat_history), question=message)
+    async with llm_semaphore:
+        result = await llm.ainvoke(prompt)
+    return result.content.strip()
+
+# Function to generate response, streaming the answer as it is produced
+async def generate_response(message, history, request: gr.Request):
+    started = time.perf_counter()
+    memory = sessions.get(request.session_hash)
+    chat_history = memory.load_memory_variables({})["chat_history"]
+
+    # A first message is already standalone; follow-ups are condensed first and
+    # retrieved once, since condensing nearly always rewrites them
+    question = await condense_question(message, chat_history)
+    docs = await retriever.ainvoke(question)
+
+    prompt = qa_prompt.format_messages(
+        context="\n\n".join(doc.page_content for doc in docs),
+        question=question,
+    )
+
+    answer = ""
+    first_token = True
+    async with llm_semaphore:
+        async for chunk in llm.astream(prompt):
+            if first_token:
+                logger.info(f"Time to first token: {time.perf_counter() - started:.2f}s")
+                first_token = False
+            answer += chunk.content
+            yield answer
+    logger.info(f"Response completed in {time.perf_counter() - started:.2f}s")
+
+    # Summary memory may call the LLM to summarise, so keep it off the event loop
+    await asyncio.to_thread(memory.save_context, {"question": message}, {"answer": answer})
 
 # Create Gradio interface
 demo = gr.ChatInterface(
     fn=generate_response,
     title="Your AI Knowledge Assistant",
     description="Ask me anything about your documents!",
-    theme="soft"
+    theme="soft",
+    concurrency_limit=CONCURRENCY_LIMIT,
 )
 
 # Launch the app
+# Document processing stays under the main guard: ingestion uses a process pool,
+# and spawned workers re-import this module.
 if __name__ == "__main__":
-    demo.launch()
\ No newline at end of file
+    # Process your documents
+    document_paths = [os.path.join("documents", f) for f in os.listdir("documents")]
+    vector_store = process_documents(document_paths)
+
+    retriever = vector_store.as_retriever()
+
+    demo.queue(max_size=QUEUE_MAX_SIZE).launch()
\ No newline at end of file
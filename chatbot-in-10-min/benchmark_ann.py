@@ -0,0 +1,88 @@
+"""Recall@k vs latency benchmark for the index types in ann_index.py.
+
+Runs on a synthetic corpus so no documents or API key are needed:
+
+    python benchmark_ann.py --n 1000000 --dim 128 --k 10
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from ann_index import build_index, load_index, save_index, tune_index
+
+
+def synthetic_corpus(n, dim, n_queries, seed=0):
+    # Clustered data is closer to real embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 1000), dim)).astype("float32")
+    labels = rng.integers(0, len(centers), n + n_queries)
+    data = centers[labels] + 0.3 * rng.standard_normal((n + n_queries, dim)).astype("float32")
+    return data[:n], data[n:]
+
+
+def recall_at_k(found, truth, k):
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def timed_search(index, queries, k):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+    return ids, elapsed * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"Generating {args.n} x {args.dim} corpus...")
+    corpus, queries = synthetic_corpus(args.n, args.dim, args.queries)
+
+    # Exact search gives the ground truth
+    flat = build_index(corpus, "flat")
+    truth, flat_ms = timed_search(flat, queries, args.k)
+    print(f"{'flat':<8} {'':<14} recall@{args.k}=1.000  {flat_ms:.3f} ms/query")
+    del flat
+
+    configs = [
+        ("ivf", {}, [("nprobe", p) for p in (1, 4, 16, 64)]),
+        ("ivfpq", {}, [("nprobe", p) for p in (1, 4, 16, 64)]),
+        ("hnsw", {}, [("ef_search", ef) for ef in (16, 32, 64, 128)]),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        for index_type, params, sweep in configs:
+            start = time.perf_counter()
+            index = build_index(corpus, index_type, **params)
+            build_s = time.perf_counter() - start
+
+            path = os.path.join(tmp, f"{index_type}.faiss")
+            save_index(index, path)
+            del index
+            start = time.perf_counter()
+            index = load_index(path, mmap=True)
+            load_ms = (time.perf_counter() - start) * 1000
+            # only the IVF index types are actually memory-mapped
+            load = "mmap load" if index_type.startswith("ivf") else "load"
+            print(f"{index_type}: built in {build_s:.1f}s, {load} {load_ms:.1f}ms")
+
+            for knob, value in sweep:
+                tune_index(index, **{knob: value})
+                ids, ms = timed_search(index, queries, args.k)
+                setting = f"{knob}={value}"
+                print(f"{index_type:<8} {setting:<14} recall@{args.k}={recall_at_k(ids, truth, args.k):.3f}  {ms:.3f} ms/query")
+            del index
+
+    print(f"faiss threads: {faiss.omp_get_max_threads()}")
+
+
+if __name__ == "__main__":
+    main()
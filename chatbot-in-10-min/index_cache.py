@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+
+from ann_index import build_vector_store, load_vector_store, save_vector_store
+
+MANIFEST_FILE = "manifest.json"
+
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def chunk_ids(path, digest, count):
+    # Ids are derived from the file path and content, so unchanged files keep their ids
+    key = hashlib.sha1(f"{path}:{digest}".encode()).hexdigest()[:16]
+    return [f"{key}-{i}" for i in range(count)]
+
+
+def read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_manifest(cache_dir, settings, files):
+    with open(os.path.join(cache_dir, MANIFEST_FILE), "w") as f:
+        json.dump({"settings": settings, "files": files}, f, indent=2)
+
+
+def load_or_build_vector_store(file_paths, embeddings, ingest_files, cache_dir, settings,
+                               nprobe=None, ef_search=None):
+    """Return a FAISS vector store for `file_paths`, reusing the on-disk index when possible.
+
+    `ingest_files(paths)` loads, splits and embeds files, yielding
+    (path, chunk, vector) triples grouped by path. `settings` holds everything
+    that affects the chunks or vectors (splitter parameters, embedding model, index
+    type); when it changes the index is rebuilt from scratch. Otherwise only new or
+    modified files are embedded, and chunks of deleted or modified files are removed.
+    """
+    digests = {path: file_digest(path) for path in file_paths}
+    manifest = read_manifest(cache_dir)
+
+    if manifest is None or manifest["settings"] != settings:
+        return _rebuild(digests, embeddings, ingest_files, cache_dir, settings, nprobe, ef_search)
+
+    cached = manifest["files"]
+    stale = [path for path in cached if digests.get(path) != cached[path]["hash"]]
+    fresh = [path for path in digests if cached.get(path, {}).get("hash") != digests[path]]
+
+    # Only a flat index renumbers its vectors on removal the way the LangChain
+    # docstore mapping expects; other index types are rebuilt instead
+    if stale and settings.get("index_type", "flat") != "flat":
+        return _rebuild(digests, embeddings, ingest_files, cache_dir, settings, nprobe, ef_search)
+
+    if not stale and not fresh:
+        print(f"Loaded cached index for {len(cached)} documents")
+        return load_vector_store(cache_dir, embeddings, mmap=True, nprobe=nprobe, ef_search=ef_search)
+
+    # The index is about to be modified, so it has to be read into memory
+    vector_store = load_vector_store(cache_dir, embeddings, mmap=False, nprobe=nprobe, ef_search=ef_search)
+    files = dict(cached)
+
+    stale_ids = [chunk_id for path in stale for chunk_id in files.pop(path)["ids"]]
+    if stale_ids:
+        vector_store.delete(stale_ids)
+
+    for path, (chunks, ids, vectors) in _collect(ingest_files, digests, fresh).items():
+        if chunks:
+            vector_store.add_embeddings(
+                zip([chunk.page_content for chunk in chunks], vectors),
+                metadatas=[chunk.metadata for chunk in chunks],
+                ids=ids,
+            )
+        files[path] = {"hash": digests[path], "ids": ids}
+
+    print(f"Updated cached index: {len(stale)} removed/changed, {len(fresh)} added/changed")
+    save_vector_store(vector_store, cache_dir)
+    write_manifest(cache_dir, settings, files)
+    return vector_store
+
+
+def _collect(ingest_files, digests, paths):
+    """Ingest `paths` and group the results as {path: (chunks, ids, vectors)}.
+
+    Files that produce no chunks still get an (empty) entry, so the manifest
+    records them and they aren't re-ingested on every start.
+    """
+    grouped = {path: ([], [], []) for path in paths}
+    if not paths:
+        return grouped
+    for path, chunk, vector in ingest_files(paths):
+        chunks, _, vectors = grouped[path]
+        chunks.append(chunk)
+        vectors.append(vector)
+    return {
+        path: (chunks, chunk_ids(path, digests[path], len(chunks)), vectors)
+        for path, (chunks, _, vectors) in grouped.items()
+    }
+
+
+def _rebuild(digests, embeddings, ingest_files, cache_dir, settings, nprobe, ef_search):
+    chunks, ids, vectors, files = [], [], [], {}
+    for path, (file_chunks, file_ids, file_vectors) in _collect(ingest_files, digests, list(digests)).items():
+        chunks.extend(file_chunks)
+        ids.extend(file_ids)
+        vectors.extend(file_vectors)
+        files[path] = {"hash": digests[path], "ids": file_ids}
+
+    vector_store = build_vector_store(
+        chunks,
+        embeddings,
+        ids=ids,
+        vectors=vectors,
+        index_type=settings.get("index_type", "flat"),
+        nprobe=nprobe,
+        ef_search=ef_search,
+    )
+    print(f"Built index for {len(files)} documents ({len(chunks)} chunks)")
+    save_vector_store(vector_store, cache_dir)
+    write_manifest(cache_dir, settings, files)
+    return vector_store
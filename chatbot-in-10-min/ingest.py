@@ -0,0 +1,90 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt')
+
+
+def load_pages(file_path):
+    """Parse a single file into page documents. Runs inside a worker process."""
+    if file_path.endswith('.pdf'):
+        loader = PyPDFLoader(file_path)
+    elif file_path.endswith('.txt'):
+        loader = TextLoader(file_path)
+    else:
+        return []
+    return loader.load()
+
+
+class IngestStats:
+    def __init__(self):
+        self.files = 0
+        self.pages = 0
+        self.chunks = 0
+        self.started = time.perf_counter()
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return (
+            f"Ingested {self.files} files, {self.pages} pages, {self.chunks} chunks in {elapsed:.1f}s "
+            f"({self.pages / elapsed:.1f} pages/s, {self.chunks / elapsed:.1f} chunks/s)"
+        )
+
+
+def _bounded(executor, fn, items, max_in_flight):
+    """Like executor.map, but never has more than `max_in_flight` results pending."""
+    items = iter(items)
+    pending = deque((item, executor.submit(fn, item)) for item in islice(items, max_in_flight))
+    while pending:
+        item, future = pending.popleft()
+        for next_item in islice(items, 1):
+            pending.append((next_item, executor.submit(fn, next_item)))
+        yield item, future.result()
+
+
+def iter_chunks(file_paths, splitter, stats, max_workers=None):
+    """Yield (file_path, chunk) pairs, parsing files in a process pool.
+
+    Pages are split one at a time as they arrive, so only a few parsed files
+    are held in memory at once regardless of the size of the folder.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for file_path, pages in _bounded(pool, load_pages, file_paths, max_workers * 2):
+            stats.files += 1
+            for page in pages:
+                stats.pages += 1
+                for chunk in splitter.split_documents([page]):
+                    stats.chunks += 1
+                    yield file_path, chunk
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def ingest(file_paths, splitter, embeddings, batch_size=100, embed_workers=4, parse_workers=None):
+    """Yield (file_path, chunk, vector) triples for `file_paths` in input order.
+
+    Parsing, chunking and embedding overlap: while one batch of chunks is being
+    embedded the next files are already being parsed, and up to `embed_workers`
+    embedding requests are in flight at once.
+    """
+    stats = IngestStats()
+    chunks = iter_chunks(file_paths, splitter, stats, max_workers=parse_workers)
+
+    def embed(batch):
+        return embeddings.embed_documents([chunk.page_content for _, chunk in batch])
+
+    with ThreadPoolExecutor(max_workers=embed_workers) as pool:
+        for batch, vectors in _bounded(pool, embed, _batched(chunks, batch_size), embed_workers):
+            for (file_path, chunk), vector in zip(batch, vectors):
+                yield file_path, chunk, vector
+
+    print(stats.report())
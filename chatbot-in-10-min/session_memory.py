@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+
+from langchain.memory import ConversationBufferWindowMemory, ConversationSummaryBufferMemory
+
+
+class SessionMemoryStore:
+    """Conversation memory per Gradio session.
+
+    Each session keeps either the last `window` exchanges or, in "summary" mode,
+    a rolling LLM summary capped at `max_token_limit`, so the condensed question
+    prompt stays the same size however long a conversation runs. Sessions idle
+    for longer than `idle_timeout` seconds are evicted, and at most
+    `max_sessions` are kept (least recently used first out).
+    """
+
+    def __init__(self, mode="window", window=5, llm=None, max_token_limit=1000,
+                 idle_timeout=1800, max_sessions=1000):
+        if mode not in ("window", "summary"):
+            raise ValueError(f"Unknown memory mode {mode!r}, expected 'window' or 'summary'")
+        if mode == "summary" and llm is None:
+            raise ValueError("Summary memory needs an llm to summarise with")
+        self.mode = mode
+        self.window = window
+        self.llm = llm
+        self.max_token_limit = max_token_limit
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session_id -> (memory, last_used)
+        self._lock = threading.Lock()
+
+    def _new_memory(self):
+        if self.mode == "summary":
+            return ConversationSummaryBufferMemory(
+                llm=self.llm,
+                max_token_limit=self.max_token_limit,
+                memory_key="chat_history",
+                input_key="question",
+                output_key="answer",
+                return_messages=True,
+            )
+        return ConversationBufferWindowMemory(
+            k=self.window,
+            memory_key="chat_history",
+            input_key="question",
+            output_key="answer",
+            return_messages=True,
+        )
+
+    def _evict(self, now):
+        # Sessions are ordered by last use, so idle ones are at the front
+        while self._sessions:
+            session_id, (_, last_used) = next(iter(self._sessions.items()))
+            if now - last_used <= self.idle_timeout and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+    def get(self, session_id):
+        """Return the memory for `session_id`, creating it on first use."""
+        now = time.monotonic()
+        with self._lock:
+            memory, _ = self._sessions.pop(session_id, (None, None))
+            if memory is None:
+                memory = self._new_memory()
+            self._sessions[session_id] = (memory, now)
+            self._evict(now)
+            return memory
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,61 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+
+@dataclass
+class Conversation:
+    """The message history of one query, or of one multi-turn session."""
+
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    messages: list = field(default_factory=list)
+    started_at: str = field(
+        default_factory=lambda: datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    )
+    # serializes turns of the same session; different conversations never wait
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+    last_used: float = field(default_factory=time.monotonic, repr=False)
+
+
+class SessionStore:
+    """Bounded store of multi-turn conversations keyed by session ID.
+
+    Sessions idle for more than `ttl` seconds are dropped, and once
+    `max_sessions` is reached the least recently used session is evicted.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl: float = 3600.0):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: OrderedDict[str, Conversation] = OrderedDict()
+
+    def get(self, session_id: Optional[str] = None) -> Conversation:
+        """Return the session's conversation, or a fresh one when no ID is given."""
+        if session_id is None:
+            return Conversation()
+
+        now = time.monotonic()
+        conversation = self._sessions.pop(session_id, None)
+        if conversation is None or now - conversation.last_used > self.ttl:
+            conversation = Conversation(id=session_id)
+        conversation.last_used = now
+        self._sessions[session_id] = conversation
+        self._evict(now)
+        return conversation
+
+    def _evict(self, now: float):
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if (
+                len(self._sessions) <= self.max_sessions
+                and now - oldest.last_used <= self.ttl
+            ):
+                break
+            self._sessions.popitem(last=False)
+
+    def __len__(self):
+        return len(self._sessions)
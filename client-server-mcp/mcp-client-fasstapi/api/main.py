@@ -1,17 +1,32 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from contextlib import asynccontextmanager
 from mcp_client import MCPClient
+from utils import metrics
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
+import json
+import time
 
 load_dotenv()
 
 
 class Settings(BaseSettings):
     server_script_path: str = "/Users/alejandro/repos/code/mcp/documentation/main.py"
+    llm_max_concurrency: int = 8
+    llm_timeout: float = 60.0
+    llm_max_connections: int = 20
+    session_max: int = 1000
+    session_ttl: float = 3600.0
+    tool_timeout: float = 60.0
+    # number of MCP server subprocesses tool calls are spread across
+    mcp_pool_size: int = 1
+    mcp_health_interval: float = 30.0
+    system_prompt: str = ""
 
 
 settings = Settings()
@@ -19,7 +34,17 @@ settings = Settings()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    client = MCPClient()
+    client = MCPClient(
+        llm_max_concurrency=settings.llm_max_concurrency,
+        llm_timeout=settings.llm_timeout,
+        llm_max_connections=settings.llm_max_connections,
+        session_max=settings.session_max,
+        session_ttl=settings.session_ttl,
+        tool_timeout=settings.tool_timeout,
+        pool_size=settings.mcp_pool_size,
+        health_interval=settings.mcp_health_interval,
+        system_prompt=settings.system_prompt,
+    )
     try:
         connected = await client.connect_to_server(settings.server_script_path)
         if not connected:
@@ -49,8 +74,36 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = None
+    try:
+        response = await call_next(request)
+        return response
+    finally:
+        # label by route template so IDs in paths don't create new series
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        metrics.http_request_duration.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            path=path,
+            status=response.status_code if response is not None else 500,
+        )
+        request_size = request.headers.get("content-length")
+        if request_size:
+            metrics.http_request_bytes.observe(int(request_size), path=path)
+        if response is not None:
+            response_size = response.headers.get("content-length")
+            if response_size:
+                metrics.http_response_bytes.observe(int(response_size), path=path)
+
+
 class QueryRequest(BaseModel):
     query: str
+    # pass the same session_id on later queries to continue the conversation
+    session_id: Optional[str] = None
 
 
 class Message(BaseModel):
@@ -67,12 +120,48 @@ class ToolCall(BaseModel):
 async def process_query(request: QueryRequest):
     """Process a query and return the response"""
     try:
-        messages = await app.state.client.process_query(request.query)
-        return {"messages": messages}
+        messages, usage = await app.state.client.process_query(
+            request.query, request.session_id
+        )
+        return {
+            "messages": messages,
+            "session_id": request.session_id,
+            "usage": usage,
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/query/stream")
+async def stream_query(request: QueryRequest):
+    """Process a query, streaming messages and tool progress as NDJSON"""
+
+    client = app.state.client
+    conversation = client.sessions.get(request.session_id)
+
+    async def events():
+        try:
+            async for event in client.stream_query(request.query, conversation):
+                yield json.dumps(jsonable_encoder(event)) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Get request, LLM and tool call latencies and sizes, and token usage,
+    in Prometheus text format"""
+    return metrics.registry.render()
+
+
+@app.get("/servers")
+async def get_servers():
+    """Get the health and load of the MCP server pool"""
+    return {"servers": app.state.client.pool.stats()}
+
+
 @app.get("/tools")
 async def get_tools():
     """Get the list of available tools"""
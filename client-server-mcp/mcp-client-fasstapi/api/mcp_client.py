@@ -1,27 +1,90 @@
 from typing import Optional
-from contextlib import AsyncExitStack
 import traceback
+import asyncio
+import logging
 
-# from utils.logger import logger
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
-from datetime import datetime
-from utils.logger import logger
-import json
-import os
+from utils import metrics
+from mcp import StdioServerParameters
+from mcp_pool import MCPServerPool
+from tool_catalogue import ToolCatalogue
+from utils.logger import logger, truncate
+from utils.conversation_log import ConversationLogWriter
+from conversation import Conversation, SessionStore
 
-from anthropic import Anthropic
+import httpx
+from anthropic import NOT_GIVEN, AsyncAnthropic, DefaultAsyncHttpxClient
 from anthropic.types import Message
 
 
+# marks the end of a prompt prefix the API should cache and reuse
+CACHE_CONTROL = {"type": "ephemeral"}
+
+USAGE_FIELDS = (
+    "input_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+    "output_tokens",
+)
+
+
+def with_cache_breakpoint(messages: list) -> list:
+    """Copy of messages with the last content block marked for prompt caching,
+    so the next call in the tool loop reads everything before it from cache"""
+    if not messages:
+        return messages
+    last = messages[-1]
+    content = last["content"]
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    else:
+        content = list(content)
+    if content and isinstance(content[-1], dict):
+        content[-1] = {**content[-1], "cache_control": CACHE_CONTROL}
+    return messages[:-1] + [{**last, "content": content}]
+
+
 class MCPClient:
-    def __init__(self):
+    def __init__(
+        self,
+        llm_max_concurrency: int = 8,
+        llm_timeout: float = 60.0,
+        llm_max_connections: int = 20,
+        session_max: int = 1000,
+        session_ttl: float = 3600.0,
+        tool_timeout: float = 60.0,
+        pool_size: int = 1,
+        health_interval: float = 30.0,
+        system_prompt: str = "",
+    ):
         # Initialize session and client objects
-        self.session: Optional[ClientSession] = None
-        self.exit_stack = AsyncExitStack()
-        self.llm = Anthropic()
-        self.tools = []
-        self.messages = []
+        self.pool: Optional[MCPServerPool] = None
+        self.pool_size = pool_size
+        self.health_interval = health_interval
+        # one pooled async client shared by all requests; the semaphore bounds
+        # how many model calls are in flight at once
+        self.llm = AsyncAnthropic(
+            timeout=httpx.Timeout(llm_timeout, connect=10.0),
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=llm_max_connections,
+                    max_keepalive_connections=llm_max_connections,
+                )
+            ),
+        )
+        self.llm_semaphore = asyncio.Semaphore(llm_max_concurrency)
+        self.system = (
+            [{"type": "text", "text": system_prompt, "cache_control": CACHE_CONTROL}]
+            if system_prompt
+            else NOT_GIVEN
+        )
+        self.model = "claude-3-5-haiku-20241022"
+        self.catalogue = ToolCatalogue()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.tool_timeout = tool_timeout
+        # conversation state lives in per-request Conversation objects, so one
+        # client can serve many queries at once
+        self.sessions = SessionStore(max_sessions=session_max, ttl=session_ttl)
+        self.conversation_log = ConversationLogWriter()
         self.logger = logger
 
     # connect to the MCP server
@@ -37,31 +100,18 @@ class MCPClient:
                 command=command, args=[server_script_path], env=None
             )
 
-            stdio_transport = await self.exit_stack.enter_async_context(
-                stdio_client(server_params)
-            )
-            self.stdio, self.write = stdio_transport
-            self.session = await self.exit_stack.enter_async_context(
-                ClientSession(self.stdio, self.write)
+            self.pool = MCPServerPool(
+                server_params,
+                size=self.pool_size,
+                health_interval=self.health_interval,
+                message_handler=self.handle_server_message,
             )
-
-            await self.session.initialize()
+            await self.pool.start()
+            self.conversation_log.start()
 
             self.logger.info("Connected to MCP server")
 
-            mcp_tools = await self.get_mcp_tools()
-            self.tools = [
-                {
-                    "name": tool.name,
-                    "description": tool.description,
-                    "input_schema": tool.inputSchema,
-                }
-                for tool in mcp_tools
-            ]
-
-            self.logger.info(
-                f"Available tools: {[tool['name'] for tool in self.tools]}"
-            )
+            await self.catalogue.refresh(self.pool.session)
 
             return True
 
@@ -70,24 +120,60 @@ class MCPClient:
             traceback.print_exc()
             raise
 
-    # get mcp tool list
-    async def get_mcp_tools(self):
+    # refresh the cached tool list when the server says it changed; this runs
+    # in the session's receive loop, so the refresh request is made from a task
+    async def handle_server_message(self, message):
+        if ToolCatalogue.is_list_changed(message):
+            self.logger.info("MCP server tool list changed, refreshing")
+            self._refresh_task = asyncio.create_task(self.refresh_tools())
+
+    async def refresh_tools(self):
         try:
-            response = await self.session.list_tools()
-            return response.tools
+            await self.catalogue.refresh(self.pool.session)
         except Exception as e:
-            self.logger.error(f"Error getting MCP tools: {e}")
-            raise
+            self.logger.error(f"Error refreshing MCP tools: {e}")
+
+    # get mcp tool list
+    async def get_mcp_tools(self):
+        return self.catalogue.tools
 
     # process query
-    async def process_query(self, query: str):
+    async def process_query(self, query: str, session_id: Optional[str] = None):
+        conversation = self.sessions.get(session_id)
+        usage = {}
+        async for event in self.stream_query(query, conversation):
+            if event["type"] == "usage":
+                usage = event["usage"]
+        return conversation.messages, usage
+
+    # process query, yielding each message and tool progress update as it happens
+    async def stream_query(self, query: str, conversation: Conversation):
+        async with conversation.lock:
+            async for event in self._run_conversation(query, conversation):
+                yield event
+
+    async def _run_conversation(self, query: str, conversation: Conversation):
+        with metrics.query_duration.time(status="ok") as labels:
+            try:
+                async for event in self._run_turn(query, conversation):
+                    yield event
+            except Exception:
+                labels["status"] = "error"
+                raise
+
+    async def _run_turn(self, query: str, conversation: Conversation):
+        messages = conversation.messages
+        turn_start = len(messages)
+        usage = dict.fromkeys(USAGE_FIELDS, 0)
+        completed = False
         try:
-            self.logger.info(f"Processing query: {query}")
+            self.logger.info(f"Processing query: {truncate(query, 200)}")
             user_message = {"role": "user", "content": query}
-            self.messages = [user_message]
+            messages.append(user_message)
+            self.log_message(conversation, user_message)
 
             while True:
-                response = await self.call_llm()
+                response = await self.call_llm(messages, usage)
 
                 # the response is a text message
                 if response.content[0].type == "text" and len(response.content) == 1:
@@ -95,8 +181,10 @@ class MCPClient:
                         "role": "assistant",
                         "content": response.content[0].text,
                     }
-                    self.messages.append(assistant_message)
-                    await self.log_conversation()
+                    messages.append(assistant_message)
+                    self.log_message(conversation, assistant_message)
+                    completed = True
+                    yield {"type": "message", "message": assistant_message}
                     break
 
                 # the response is a tool call
@@ -104,53 +192,151 @@ class MCPClient:
                     "role": "assistant",
                     "content": response.to_dict()["content"],
                 }
-                self.messages.append(assistant_message)
-                await self.log_conversation()
-
-                for content in response.content:
-                    if content.type == "tool_use":
-                        tool_name = content.name
-                        tool_args = content.input
-                        tool_use_id = content.id
-                        self.logger.info(
-                            f"Calling tool {tool_name} with args {tool_args}"
-                        )
-                        try:
-                            result = await self.session.call_tool(tool_name, tool_args)
-                            self.logger.info(f"Tool {tool_name} result: {result}...")
-                            self.messages.append(
-                                {
-                                    "role": "user",
-                                    "content": [
-                                        {
-                                            "type": "tool_result",
-                                            "tool_use_id": tool_use_id,
-                                            "content": result.content,
-                                        }
-                                    ],
-                                }
-                            )
-                            await self.log_conversation()
-                        except Exception as e:
-                            self.logger.error(f"Error calling tool {tool_name}: {e}")
-                            raise
-
-            return self.messages
+                messages.append(assistant_message)
+                self.log_message(conversation, assistant_message)
+                yield {"type": "message", "message": assistant_message}
+
+                # run every tool call of this turn concurrently and answer
+                # them all in a single message, in the order they were requested
+                tool_uses = [
+                    content for content in response.content if content.type == "tool_use"
+                ]
+                if not tool_uses:
+                    completed = True
+                    break
+                tool_results = []
+                async for event in self.call_tools_streaming(tool_uses):
+                    if event["type"] == "tool_results":
+                        tool_results = event["results"]
+                    else:
+                        yield event
+                tool_message = {"role": "user", "content": tool_results}
+                messages.append(tool_message)
+                self.log_message(conversation, tool_message)
+                yield {"type": "message", "message": tool_message}
+
+            self.logger.info(f"Token usage: {usage}")
+            yield {"type": "usage", "usage": usage}
 
         except Exception as e:
             self.logger.error(f"Error processing query: {e}")
             raise
 
+        finally:
+            # drop a turn that failed or was abandoned by a disconnected client,
+            # so the session never keeps a tool_use without its tool_result
+            if not completed:
+                del messages[turn_start:]
+
+    # call one tool, turning failures and timeouts into error results for the model
+    async def call_tool(self, tool_use, progress_callback=None):
+        self.logger.info(
+            f"Calling tool {tool_use.name} with args {truncate(tool_use.input, 200)}"
+        )
+        with metrics.tool_call_duration.time(tool=tool_use.name, status="ok") as labels:
+            try:
+                result = await asyncio.wait_for(
+                    self.pool.call_tool(
+                        tool_use.name, tool_use.input, progress_callback=progress_callback
+                    ),
+                    timeout=self.tool_timeout,
+                )
+            except asyncio.TimeoutError:
+                labels["status"] = "timeout"
+                result = None
+                error = f"Tool timed out after {self.tool_timeout} seconds"
+            except Exception as e:
+                labels["status"] = "error"
+                result = None
+                error = f"Tool call failed: {e}"
+
+        if result is not None:
+            size = sum(len(getattr(item, "text", "") or "") for item in result.content)
+            metrics.tool_result_bytes.observe(size, tool=tool_use.name)
+            self.logger.info(f"Tool {tool_use.name} returned {size} chars")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Tool {tool_use.name} result: {truncate(result)}")
+            return {
+                "type": "tool_result",
+                "tool_use_id": tool_use.id,
+                "content": result.content,
+                "is_error": result.isError,
+            }
+
+        self.logger.error(f"Error calling tool {tool_use.name}: {error}")
+        return {
+            "type": "tool_result",
+            "tool_use_id": tool_use.id,
+            "content": error,
+            "is_error": True,
+        }
+
+    # call tools concurrently, yielding their progress notifications while they run
+    async def call_tools_streaming(self, tool_uses: list):
+        updates = asyncio.Queue()
+
+        def on_progress(tool_use):
+            async def callback(progress: float, total: float | None, message: str | None):
+                await updates.put(
+                    {
+                        "type": "tool_progress",
+                        "tool": tool_use.name,
+                        # tells apart several calls of the same tool in one turn
+                        "tool_use_id": tool_use.id,
+                        "progress": progress,
+                        "total": total,
+                        "message": message,
+                    }
+                )
+
+            return callback
+
+        calls = asyncio.gather(
+            *(
+                self.call_tool(tool_use, progress_callback=on_progress(tool_use))
+                for tool_use in tool_uses
+            )
+        )
+        try:
+            while not calls.done():
+                next_update = asyncio.create_task(updates.get())
+                done, _ = await asyncio.wait(
+                    {calls, next_update}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if next_update in done:
+                    yield next_update.result()
+                else:
+                    next_update.cancel()
+            while not updates.empty():
+                yield updates.get_nowait()
+        finally:
+            if not calls.done():
+                calls.cancel()
+        yield {"type": "tool_results", "results": calls.result()}
+
     # call llm
-    async def call_llm(self):
+    async def call_llm(self, messages: list, usage: Optional[dict] = None):
         try:
             self.logger.info("Calling LLM")
-            return self.llm.messages.create(
-                model="claude-3-5-haiku-20241022",
-                max_tokens=1000,
-                messages=self.messages,
-                tools=self.tools,
-            )
+            async with self.llm_semaphore:
+                with metrics.llm_call_duration.time(model=self.model, status="ok") as labels:
+                    try:
+                        response = await self.llm.messages.create(
+                            model=self.model,
+                            max_tokens=1000,
+                            system=self.system,
+                            messages=with_cache_breakpoint(messages),
+                            tools=self.catalogue.anthropic_cached,
+                        )
+                    except Exception:
+                        labels["status"] = "error"
+                        raise
+            for field in USAGE_FIELDS:
+                tokens = getattr(response.usage, field, None) or 0
+                metrics.llm_tokens.inc(tokens, model=self.model, type=field)
+                if usage is not None:
+                    usage[field] += tokens
+            return response
         except Exception as e:
             self.logger.error(f"Error calling LLM: {e}")
             raise
@@ -158,53 +344,15 @@ class MCPClient:
     # cleanup
     async def cleanup(self):
         try:
-            await self.exit_stack.aclose()
+            if self.pool is not None:
+                await self.pool.close()
+            await self.llm.close()
+            await asyncio.to_thread(self.conversation_log.stop)
             self.logger.info("Disconnected from MCP server")
         except Exception as e:
             self.logger.error(f"Error during cleanup: {e}")
             traceback.print_exc()
             raise
 
-    async def log_conversation(self):
-        os.makedirs("conversations", exist_ok=True)
-
-        serializable_conversation = []
-
-        for message in self.messages:
-            try:
-                serializable_message = {"role": message["role"], "content": []}
-
-                # Handle both string and list content
-                if isinstance(message["content"], str):
-                    serializable_message["content"] = message["content"]
-                elif isinstance(message["content"], list):
-                    for content_item in message["content"]:
-                        if hasattr(content_item, "to_dict"):
-                            serializable_message["content"].append(
-                                content_item.to_dict()
-                            )
-                        elif hasattr(content_item, "dict"):
-                            serializable_message["content"].append(content_item.dict())
-                        elif hasattr(content_item, "model_dump"):
-                            serializable_message["content"].append(
-                                content_item.model_dump()
-                            )
-                        else:
-                            serializable_message["content"].append(content_item)
-
-                serializable_conversation.append(serializable_message)
-            except Exception as e:
-                self.logger.error(f"Error processing message: {str(e)}")
-                self.logger.debug(f"Message content: {message}")
-                raise
-
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        filepath = os.path.join("conversations", f"conversation_{timestamp}.json")
-
-        try:
-            with open(filepath, "w") as f:
-                json.dump(serializable_conversation, f, indent=2, default=str)
-        except Exception as e:
-            self.logger.error(f"Error writing conversation to file: {str(e)}")
-            self.logger.debug(f"Serializable conversation: {serializable_conversation}")
-            raise
\ No newline at end of file
+    def log_message(self, conversation: Conversation, message: dict):
+        self.conversation_log.log(conversation.id, message)
@@ -0,0 +1,154 @@
+import asyncio
+from typing import Optional
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+from utils.logger import logger
+
+
+class MCPServerConnection:
+    """One stdio MCP server subprocess and its client session.
+
+    The transport and session are entered and exited inside a dedicated task,
+    because their anyio cancel scopes must be closed by the task that opened
+    them; this is what lets a connection be restarted from anywhere.
+    """
+
+    def __init__(self, server_params: StdioServerParameters, index: int, message_handler=None):
+        self.server_params = server_params
+        self.index = index
+        self.message_handler = message_handler
+        self.session: Optional[ClientSession] = None
+        self.in_flight = 0
+        self.restarts = 0
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+
+    @property
+    def healthy(self) -> bool:
+        return self.session is not None
+
+    async def start(self):
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name=f"mcp-server-{self.index}")
+        await self._ready.wait()
+        if self.session is None:
+            raise RuntimeError(f"MCP server {self.index} failed to start")
+
+    async def _run(self):
+        try:
+            async with stdio_client(self.server_params) as (read, write):
+                async with ClientSession(
+                    read, write, message_handler=self.message_handler
+                ) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._stop.wait()
+        except Exception as e:
+            logger.error(f"MCP server {self.index} stopped: {e}")
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def close(self):
+        if self._task is not None:
+            self._stop.set()
+            await self._task
+            self._task = None
+
+    async def restart(self):
+        logger.warning(f"Restarting MCP server {self.index}")
+        self.restarts += 1
+        await self.close()
+        await self.start()
+
+
+class MCPServerPool:
+    """A pool of identical MCP server subprocesses.
+
+    Tool calls go to the healthy server with the fewest calls in flight.
+    A background task pings every server periodically and restarts any that
+    have crashed or stopped answering.
+    """
+
+    def __init__(
+        self,
+        server_params: StdioServerParameters,
+        size: int = 1,
+        health_interval: float = 30.0,
+        ping_timeout: float = 5.0,
+        message_handler=None,
+    ):
+        self.connections = [
+            MCPServerConnection(server_params, i, message_handler=message_handler)
+            for i in range(size)
+        ]
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self._health_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await asyncio.gather(*(conn.start() for conn in self.connections))
+        self._health_task = asyncio.create_task(self._health_loop())
+        logger.info(f"Started {len(self.connections)} MCP server(s)")
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        await asyncio.gather(
+            *(conn.close() for conn in self.connections), return_exceptions=True
+        )
+
+    def acquire(self) -> MCPServerConnection:
+        healthy = [conn for conn in self.connections if conn.healthy]
+        if not healthy:
+            raise RuntimeError("No healthy MCP server available")
+        return min(healthy, key=lambda conn: conn.in_flight)
+
+    @property
+    def session(self) -> ClientSession:
+        """Session of the least busy server, for one-off requests."""
+        return self.acquire().session
+
+    async def call_tool(self, name: str, arguments: dict, progress_callback=None):
+        conn = self.acquire()
+        conn.in_flight += 1
+        try:
+            return await conn.session.call_tool(
+                name, arguments, progress_callback=progress_callback
+            )
+        finally:
+            conn.in_flight -= 1
+
+    async def check(self, conn: MCPServerConnection):
+        try:
+            if not conn.healthy:
+                raise RuntimeError("not running")
+            await asyncio.wait_for(conn.session.send_ping(), timeout=self.ping_timeout)
+        except Exception as e:
+            logger.error(f"MCP server {conn.index} failed health check: {e}")
+            try:
+                await conn.restart()
+            except Exception as e:
+                logger.error(f"Could not restart MCP server {conn.index}: {e}")
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await asyncio.gather(*(self.check(conn) for conn in self.connections))
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "index": conn.index,
+                "healthy": conn.healthy,
+                "in_flight": conn.in_flight,
+                "restarts": conn.restarts,
+            }
+            for conn in self.connections
+        ]
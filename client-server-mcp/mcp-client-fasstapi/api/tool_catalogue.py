@@ -0,0 +1,111 @@
+from mcp import types
+
+from utils.logger import logger
+
+# GEMINI_UNSUPPORTED_KEYS, SCHEMA_KEYS, SCHEMA_LIST_KEYS and gemini_schema are
+# duplicated in test-mcp/client.py; the projects are installed separately, so
+# apply any fix to both copies
+
+# JSON Schema keywords Gemini function declarations do not accept
+GEMINI_UNSUPPORTED_KEYS = {
+    "$schema",
+    "$defs",
+    "$ref",
+    "title",
+    "default",
+    "examples",
+    "additionalProperties",
+}
+
+
+def to_anthropic(tool: types.Tool) -> dict:
+    return {
+        "name": tool.name,
+        "description": tool.description,
+        "input_schema": tool.inputSchema,
+    }
+
+
+# Keywords whose value is a schema, or a list of schemas
+SCHEMA_KEYS = {"items", "not"}
+SCHEMA_LIST_KEYS = {"anyOf", "oneOf", "allOf", "prefixItems"}
+
+
+def gemini_schema(schema, defs=None, seen=()):
+    """Inline `$ref`s and drop keywords Gemini rejects.
+
+    Keywords are only stripped where a schema is expected, so a property
+    that happens to be called `title` or `default` is kept.
+    """
+    if not isinstance(schema, dict):
+        return schema
+    if defs is None:
+        defs = schema.get("$defs", {})
+
+    ref = schema.get("$ref")
+    if ref is not None:
+        name = ref.rsplit("/", 1)[-1]
+        if name in seen or name not in defs:
+            # Gemini has no way to express recursive types
+            return {"type": "object"}
+        siblings = {key: value for key, value in schema.items() if key != "$ref"}
+        return gemini_schema({**defs[name], **siblings}, defs, seen + (name,))
+
+    result = {}
+    for key, value in schema.items():
+        if key in GEMINI_UNSUPPORTED_KEYS:
+            continue
+        if key == "properties" and isinstance(value, dict):
+            result[key] = {
+                name: gemini_schema(prop, defs, seen) for name, prop in value.items()
+            }
+        elif key in SCHEMA_KEYS:
+            result[key] = gemini_schema(value, defs, seen)
+        elif key in SCHEMA_LIST_KEYS and isinstance(value, list):
+            result[key] = [gemini_schema(item, defs, seen) for item in value]
+        else:
+            result[key] = value
+    return result
+
+
+def to_gemini(tool: types.Tool) -> dict:
+    declaration = {"name": tool.name, "description": tool.description or ""}
+    parameters = gemini_schema(tool.inputSchema)
+    if parameters.get("properties"):
+        declaration["parameters"] = parameters
+    return declaration
+
+
+class ToolCatalogue:
+    """The server's tools, listed once and kept translated for each LLM provider.
+
+    It is refreshed only when the server sends a tools/list_changed
+    notification, so queries never pay for a list or a schema conversion.
+    """
+
+    def __init__(self):
+        self.tools: list[types.Tool] = []
+        self.anthropic: list[dict] = []
+        # the tool definitions are the start of every prompt, so the last one
+        # carries a cache breakpoint
+        self.anthropic_cached: list[dict] = []
+        self.gemini: list[dict] = []
+
+    def update(self, tools: list[types.Tool]):
+        self.tools = list(tools)
+        self.anthropic = [to_anthropic(tool) for tool in self.tools]
+        self.anthropic_cached = [dict(tool) for tool in self.anthropic]
+        if self.anthropic_cached:
+            self.anthropic_cached[-1]["cache_control"] = {"type": "ephemeral"}
+        self.gemini = [to_gemini(tool) for tool in self.tools]
+        logger.info(f"Available tools: {[tool.name for tool in self.tools]}")
+
+    async def refresh(self, session):
+        response = await session.list_tools()
+        self.update(response.tools)
+
+    @staticmethod
+    def is_list_changed(message) -> bool:
+        return isinstance(message, types.ServerNotification) and isinstance(
+            message.root, types.ToolListChangedNotification
+        )
@@ -0,0 +1,162 @@
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from utils.logger import logger
+
+_STOP = object()
+
+
+def serialize_message(message: dict) -> dict:
+    serializable_message = {"role": message["role"], "content": []}
+
+    # Handle both string and list content
+    if isinstance(message["content"], str):
+        serializable_message["content"] = message["content"]
+    elif isinstance(message["content"], list):
+        for content_item in message["content"]:
+            if hasattr(content_item, "to_dict"):
+                serializable_message["content"].append(content_item.to_dict())
+            elif hasattr(content_item, "dict"):
+                serializable_message["content"].append(content_item.dict())
+            elif hasattr(content_item, "model_dump"):
+                serializable_message["content"].append(content_item.model_dump())
+            else:
+                serializable_message["content"].append(content_item)
+
+    return serializable_message
+
+
+class ConversationLogWriter:
+    """Appends conversation messages to JSONL files from a background thread.
+
+    `log` only enqueues, so request handling never waits on serialization or
+    disk I/O. Records are written in batches and flushed at least every
+    `flush_interval` seconds, and a new file is started once the current one
+    exceeds `max_file_bytes`. If the queue is full, records are dropped and
+    counted rather than blocking the caller.
+    """
+
+    def __init__(
+        self,
+        directory: str = "conversations",
+        max_queue: int = 10000,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_file_bytes: int = 50 * 1024 * 1024,
+    ):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_file_bytes = max_file_bytes
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._file = None
+
+    def start(self):
+        if self._thread is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(
+                target=self._run, name="conversation-log", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Write out everything still queued, then stop the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def log(self, conversation_id: str, message: dict):
+        try:
+            self._queue.put_nowait((time.time(), conversation_id, message))
+        except queue.Full:
+            self.dropped += 1
+
+    def _open_file(self):
+        if self._file is not None:
+            self._file.close()
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S-%f")
+        path = os.path.join(self.directory, f"conversations_{timestamp}.jsonl")
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _write(self, batch: list):
+        lines = []
+        for timestamp, conversation_id, message in batch:
+            try:
+                record = {
+                    "timestamp": timestamp,
+                    "conversation_id": conversation_id,
+                    **serialize_message(message),
+                }
+                lines.append(json.dumps(record, default=str) + "\n")
+            except Exception as e:
+                logger.error(f"Error serializing conversation message: {e}")
+
+        if self._file is None or self._file.tell() >= self.max_file_bytes:
+            self._open_file()
+        self._file.writelines(lines)
+        self._file.flush()
+        self.written += len(lines)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    logger.error(f"Error writing conversation log: {e}")
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+if __name__ == "__main__":
+    # Logging overhead per step: the old full rewrite of the conversation as
+    # pretty-printed JSON vs enqueueing one message for the background writer.
+    # Run from the api directory: python -m utils.conversation_log
+    import tempfile
+
+    message = {"role": "user", "content": [{"type": "text", "text": "x" * 2000}]}
+    steps = 200
+
+    with tempfile.TemporaryDirectory() as directory:
+        conversation = []
+        start = time.perf_counter()
+        for step in range(steps):
+            conversation.append(message)
+            with open(os.path.join(directory, "conversation.json"), "w") as f:
+                json.dump([serialize_message(m) for m in conversation], f, indent=2, default=str)
+        rewrite = (time.perf_counter() - start) / steps
+
+        writer = ConversationLogWriter(directory)
+        writer.start()
+        start = time.perf_counter()
+        for step in range(steps):
+            writer.log("benchmark", message)
+        enqueue = (time.perf_counter() - start) / steps
+        writer.stop()
+
+    print(f"full rewrite: {rewrite * 1e6:9.1f} us/step over {steps} steps")
+    print(f"enqueue:      {enqueue * 1e6:9.1f} us/step ({writer.written} written, {writer.dropped} dropped)")
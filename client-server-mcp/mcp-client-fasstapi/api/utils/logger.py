@@ -19,4 +19,11 @@ console_handler.setLevel(logging.INFO)
 console_handler.setFormatter(
     logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 )
-logger.addHandler(console_handler)
\ No newline at end of file
+logger.addHandler(console_handler)
+
+def truncate(value, limit: int = 500) -> str:
+    """Shorten a value for logging so large payloads don't slow the hot path"""
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... ({len(text) - limit} more chars)"
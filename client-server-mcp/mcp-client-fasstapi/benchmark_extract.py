@@ -0,0 +1,59 @@
+"""Compare parse time and output size of the HTML extraction backends.
+
+    python benchmark_extract.py https://python.langchain.com/docs/introduction/ page.html
+
+With no arguments a synthetic docs page is used.
+"""
+import sys
+import time
+
+import httpx
+
+from extract import available_backends, extract_text, extract_text_legacy
+
+
+def synthetic_page() -> str:
+    nav = "".join(f'<li><a href="/docs/{i}">Section {i}</a></li>' for i in range(300))
+    body = "".join(
+        f"<h2>Heading {i}</h2><p>{'Some documentation text with <code>code</code>. ' * 20}</p>"
+        f"<pre><code>example_{i}()</code></pre>"
+        for i in range(100)
+    )
+    script = "<script>" + "var x = 1;" * 2000 + "</script>"
+    return (
+        f"<html><head>{script}<style>body {{ color: black; }}</style></head><body>"
+        f"<header><nav><ul>{nav}</ul></nav></header>"
+        f"<main><article>{body}</article></main>"
+        f"<aside><ul>{nav}</ul></aside><footer>Footer links</footer></body></html>"
+    )
+
+
+def load(source: str) -> str:
+    if source.startswith(("http://", "https://")):
+        return httpx.get(source, follow_redirects=True, timeout=30.0).text
+    with open(source, encoding="utf-8") as f:
+        return f.read()
+
+
+def bench(fn, html: str, repeat: int = 5) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = fn(html)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, len(text)
+
+
+def main():
+    pages = [(source, load(source)) for source in sys.argv[1:]] or [("synthetic", synthetic_page())]
+    for name, html in pages:
+        print(f"{name} ({len(html) / 1024:.0f} KB of HTML)")
+        ms, size = bench(extract_text_legacy, html)
+        print(f"  {'baseline (html.parser, whole page)':<36} {ms:8.1f} ms  {size:>8} chars")
+        for backend in available_backends():
+            ms, size = bench(lambda h: extract_text(h, backend=backend), html)
+            print(f"  {backend + ' + main content':<36} {ms:8.1f} ms  {size:>8} chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# How long a write waits for another process holding the database lock
+BUSY_TIMEOUT = 5.0
+
+
+@dataclass
+class CacheEntry:
+    value: str
+    etag: str | None
+    last_modified: str | None
+    stored_at: float
+    fresh: bool
+
+
+class DiskCache:
+    """SQLite-backed cache with a TTL and a total size bound.
+
+    Expired entries are kept (until evicted) so their validators can be used for
+    a conditional request; `fresh` tells the caller whether revalidation is due.
+    When the stored values exceed `max_bytes`, the least recently used entries
+    are evicted.
+
+    Several server processes can share one database file. The async methods
+    run their queries in a worker thread, and a database error is logged and
+    treated as a cache miss instead of failing the tool call.
+    """
+
+    def __init__(self, path: str, table: str, ttl: float, max_bytes: int):
+        self.table = table
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0, "errors": 0}
+        # One connection is shared by the worker threads, one query at a time
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self.db.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT * 1000)}")
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            f"""CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )"""
+        )
+        self.db.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed_at)")
+        self.db.commit()
+
+    async def get(self, key: str) -> CacheEntry | None:
+        return await self._run(self._get, key)
+
+    async def put(self, key: str, value: str, etag: str | None = None, last_modified: str | None = None):
+        await self._run(self._put, key, value, etag, last_modified)
+
+    async def revalidated(self, key: str):
+        """Mark an entry fresh again after the origin answered 304 Not Modified."""
+        await self._run(self._revalidated, key)
+
+    async def metrics(self) -> dict:
+        return await self._run(self._metrics) or {**self.stats}
+
+    async def _run(self, method, *args):
+        def locked():
+            with self._lock:
+                try:
+                    return method(*args)
+                except sqlite3.Error as e:
+                    self.db.rollback()
+                    self.stats["errors"] += 1
+                    logger.warning(f"{self.table} cache error, treating as a miss: {e}")
+                    return None
+
+        return await asyncio.to_thread(locked)
+
+    def _get(self, key: str) -> CacheEntry | None:
+        row = self.db.execute(
+            f"SELECT value, etag, last_modified, stored_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+
+        now = time.time()
+        self.db.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+        self.db.commit()
+        value, etag, last_modified, stored_at = row
+        entry = CacheEntry(value, etag, last_modified, stored_at, fresh=now - stored_at < self.ttl)
+        self.stats["hits" if entry.fresh else "misses"] += 1
+        return entry
+
+    def _put(self, key: str, value: str, etag: str | None, last_modified: str | None):
+        now = time.time()
+        self.db.execute(
+            f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, value, etag, last_modified, now, now, len(value.encode())),
+        )
+        self.stats["stores"] += 1
+        self._evict()
+        self.db.commit()
+
+    def _revalidated(self, key: str):
+        now = time.time()
+        self.db.execute(
+            f"UPDATE {self.table} SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key)
+        )
+        self.db.commit()
+        self.stats["revalidated"] += 1
+
+    def _evict(self):
+        (total,) = self.db.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self.db.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            total -= size
+            self.stats["evictions"] += 1
+
+    def _metrics(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        (entries, size) = self.db.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+        ).fetchone()
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
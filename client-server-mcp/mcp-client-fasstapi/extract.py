@@ -0,0 +1,104 @@
+import re
+
+from bs4 import BeautifulSoup
+
+try:
+    # The lexbor parser; selectolax 1.0 removed the old selectolax.parser module
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml  # noqa: F401 - only needed as a BeautifulSoup parser
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+# Elements that never hold documentation text
+NOISE_TAGS = [
+    "script", "style", "noscript", "template", "svg", "iframe",
+    "nav", "header", "footer", "aside", "form", "button",
+]
+
+# Tried in order to find the main content of a docs page
+MAIN_SELECTORS = [
+    "main",
+    "article",
+    "[role=main]",
+    "#main-content",
+    "#content",
+    ".markdown",
+    ".document",
+]
+
+_SPACES = re.compile(r"[ \t\r\f\v\u00a0]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def available_backends() -> list[str]:
+    backends = []
+    if HTMLParser is not None:
+        backends.append("selectolax")
+    if HAS_LXML:
+        backends.append("lxml")
+    backends.append("html.parser")
+    return backends
+
+
+def default_backend() -> str:
+    return available_backends()[0]
+
+
+def collapse_whitespace(text: str) -> str:
+    lines = (_SPACES.sub(" ", line).strip() for line in text.splitlines())
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _extract_selectolax(html: str, main_content: bool) -> str:
+    tree = HTMLParser(html)
+    tree.strip_tags(NOISE_TAGS)
+    root = None
+    if main_content:
+        for selector in MAIN_SELECTORS:
+            root = tree.css_first(selector)
+            if root is not None:
+                break
+    root = root or tree.body or tree.root
+    return root.text(separator="\n") if root is not None else ""
+
+
+def _extract_soup(html: str, main_content: bool, parser: str) -> str:
+    soup = BeautifulSoup(html, parser)
+    for tag in soup(NOISE_TAGS):
+        tag.decompose()
+    root = None
+    if main_content:
+        for selector in MAIN_SELECTORS:
+            root = soup.select_one(selector)
+            if root is not None:
+                break
+    root = root or soup.body or soup
+    return root.get_text("\n")
+
+
+def extract_text(html: str, backend: str | None = None, main_content: bool = True) -> str:
+    """Extract readable text from an HTML page.
+
+    Scripts, navigation and other page chrome are dropped, the main content
+    element is used when one can be found, and whitespace is collapsed.
+    """
+    backend = backend or default_backend()
+    if backend == "selectolax":
+        if HTMLParser is None:
+            raise ValueError("selectolax backend requested but selectolax is not installed")
+        text = _extract_selectolax(html, main_content)
+    elif backend in ("lxml", "html.parser"):
+        text = _extract_soup(html, main_content, backend)
+    else:
+        raise ValueError(f"Unknown extraction backend {backend!r}, expected one of {available_backends()}")
+    return collapse_whitespace(text)
+
+
+def extract_text_legacy(html: str) -> str:
+    """The original whole-page extraction, kept as the benchmark baseline."""
+    return BeautifulSoup(html, "html.parser").get_text()
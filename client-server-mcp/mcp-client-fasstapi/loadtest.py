@@ -0,0 +1,80 @@
+"""Load test for the /query endpoint against a mock LLM.
+
+1. Start the mock LLM (answers every request with plain text after a delay):
+       python loadtest.py mock-llm --port 8100 --delay 0.5
+2. Start the API pointed at it:
+       ANTHROPIC_BASE_URL=http://localhost:8100 ANTHROPIC_API_KEY=test python api/main.py
+3. Measure throughput at increasing concurrency:
+       python loadtest.py run --url http://localhost:8000 --requests 64
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+
+def mock_llm_app(delay: float):
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.post("/v1/messages")
+    async def messages(body: dict):
+        await asyncio.sleep(delay)
+        return {
+            "id": f"msg_{uuid.uuid4().hex}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "mock"),
+            "content": [{"type": "text", "text": "Mock answer."}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 10, "output_tokens": 3},
+        }
+
+    return app
+
+
+async def run(url: str, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120.0) as client:
+
+        async def one(i: int):
+            async with semaphore:
+                response = await client.post("/query", json={"query": f"load test {i}"})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    mock = commands.add_parser("mock-llm")
+    mock.add_argument("--port", type=int, default=8100)
+    mock.add_argument("--delay", type=float, default=0.5)
+
+    load = commands.add_parser("run")
+    load.add_argument("--url", default="http://localhost:8000")
+    load.add_argument("--requests", type=int, default=64)
+    load.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+
+    args = parser.parse_args()
+    if args.command == "mock-llm":
+        import uvicorn
+
+        uvicorn.run(mock_llm_app(args.delay), host="127.0.0.1", port=args.port)
+        return
+
+    for concurrency in args.concurrency:
+        elapsed = asyncio.run(run(args.url, args.requests, concurrency))
+        print(f"concurrency={concurrency:<4} {args.requests / elapsed:7.2f} req/s ({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,123 @@
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
 import httpx
 import json
+import logging
+import multiprocessing
 import os
-from bs4 import BeautifulSoup
+from docs_cache import DiskCache
+from extract import available_backends, extract_text
+from relevance import format_chunks, select_chunks
 load_dotenv()
 
-mcp = FastMCP("docs")
+# stdout carries the MCP stdio transport, so logs go to stderr
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("docs")
 
 USER_AGENT = "docs-app/1.0"
-SERPER_URL="https://google.serper.dev/search"
+SERPER_URL = os.getenv("SERPER_URL", "https://google.serper.dev/search")
+
+# Connection pool and fan-out settings
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "4"))
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))
+GET_DOCS_DEADLINE = float(os.getenv("GET_DOCS_DEADLINE", "40"))
+
+# Cache settings
+CACHE_PATH = os.getenv("DOCS_CACHE_PATH", "docs_cache.sqlite3")
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "3600"))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "900"))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(10 * 1024 * 1024)))
+
+page_cache = DiskCache(CACHE_PATH, "pages", PAGE_CACHE_TTL, PAGE_CACHE_MAX_BYTES)
+search_cache = DiskCache(CACHE_PATH, "searches", SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_BYTES)
+
+# Text extraction settings: backend is one of extract.available_backends(),
+# pool is "thread" or "process"
+EXTRACT_BACKEND = os.getenv("EXTRACT_BACKEND") or None
+EXTRACT_POOL = os.getenv("EXTRACT_POOL", "thread")
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# An explicitly requested backend that can't be imported is a configuration error
+if EXTRACT_BACKEND and EXTRACT_BACKEND not in available_backends():
+    raise RuntimeError(
+        f"EXTRACT_BACKEND={EXTRACT_BACKEND!r} is not available, installed backends: {available_backends()}"
+    )
+if EXTRACT_POOL not in ("thread", "process"):
+    raise RuntimeError(f"EXTRACT_POOL must be 'thread' or 'process', not {EXTRACT_POOL!r}")
+
+# Result size budget for get_docs; roughly 4 characters per token
+DOCS_MAX_CHARS = int(os.getenv("DOCS_MAX_CHARS", "12000"))
+DOCS_CHUNK_SIZE = int(os.getenv("DOCS_CHUNK_SIZE", "1200"))
+
+_http_client: httpx.AsyncClient | None = None
+_extract_executor: Executor | None = None
+_host_limits: dict[str, asyncio.Semaphore] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared client, so connections are kept alive and reused across tool calls."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            follow_redirects=True,
+        )
+    return _http_client
+
+
+def get_extract_executor() -> Executor:
+    """Pool that runs HTML parsing, so it never blocks the MCP event loop."""
+    global _extract_executor
+    if _extract_executor is None:
+        if EXTRACT_POOL == "process":
+            # Forked workers inherit the stdio transport's threads and locks and
+            # deadlock, so they are started fresh instead
+            _extract_executor = ProcessPoolExecutor(
+                max_workers=EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _extract_executor = ThreadPoolExecutor(max_workers=EXTRACT_WORKERS)
+    return _extract_executor
+
+
+async def html_to_text(html: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_extract_executor(), extract_text, html, EXTRACT_BACKEND)
+
+
+def host_limit(url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).netloc
+    if host not in _host_limits:
+        _host_limits[host] = asyncio.Semaphore(MAX_CONNECTIONS_PER_HOST)
+    return _host_limits[host]
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    global _http_client, _extract_executor
+    try:
+        yield
+    finally:
+        if _http_client is not None:
+            await _http_client.aclose()
+            _http_client = None
+        if _extract_executor is not None:
+            _extract_executor.shutdown(cancel_futures=True)
+            _extract_executor = None
+
+
+mcp = FastMCP("docs", lifespan=lifespan)
 
 docs_urls = {
     "langchain": "python.langchain.com/docs",
@@ -18,6 +126,11 @@ docs_urls = {
 }
 
 async def search_web(query: str) -> dict | None:
+    # The query already carries the library's site: filter, so it is a complete key
+    cached = await search_cache.get(query)
+    if cached and cached.fresh:
+        return json.loads(cached.value)
+
     payload = json.dumps({"q": query, "num": 2})
 
     headers = {
@@ -25,28 +138,77 @@ async def search_web(query: str) -> dict | None:
         "Content-Type": "application/json",
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                SERPER_URL, headers=headers, data=payload, timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.TimeoutException:
-            return {"organic": []}
+    client = get_http_client()
+    try:
+        response = await client.post(
+            SERPER_URL, headers=headers, data=payload, timeout=30.0
+        )
+        response.raise_for_status()
+        await search_cache.put(query, response.text)
+        return response.json()
+    except httpx.TimeoutException:
+        return {"organic": []}
   
 async def fetch_url(url: str):
-  async with httpx.AsyncClient() as client:
+  cached = await page_cache.get(url)
+  if cached and cached.fresh:
+    return cached.value
+
+  # Revalidate an expired entry instead of downloading the page again
+  headers = {}
+  if cached and cached.etag:
+    headers["If-None-Match"] = cached.etag
+  if cached and cached.last_modified:
+    headers["If-Modified-Since"] = cached.last_modified
+
+  client = get_http_client()
+  async with host_limit(url):
         try:
-            response = await client.get(url, timeout=30.0)
-            soup = BeautifulSoup(response.text, "html.parser")
-            text = soup.get_text()
+            response = await client.get(url, headers=headers, timeout=30.0)
+            if response.status_code == 304 and cached:
+                await page_cache.revalidated(url)
+                return cached.value
+            text = await html_to_text(response.text)
+            if response.is_success:
+                await page_cache.put(
+                    url,
+                    text,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                )
             return text
         except httpx.TimeoutException:
             return "Timeout error"
 
+async def fetch_all(urls: list[str], on_page=None) -> list[tuple[str, str]]:
+  """Fetch pages concurrently, returning those that finish before the deadline in input order.
+
+  `on_page(url, text)`, if given, is awaited as soon as each page arrives.
+  """
+  semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+  async def fetch(url: str):
+    async with semaphore:
+      text = await fetch_url(url)
+    if on_page is not None:
+      await on_page(url, text)
+    return text
+
+  tasks = [asyncio.create_task(fetch(url)) for url in urls]
+  if not tasks:
+    return []
+  done, pending = await asyncio.wait(tasks, timeout=GET_DOCS_DEADLINE)
+  for task in pending:
+    task.cancel()
+
+  pages = []
+  for url, task in zip(urls, tasks):
+    if task in done and task.exception() is None:
+      pages.append((url, task.result()))
+  return pages
+
 @mcp.tool()  
-async def get_docs(query: str, library: str):
+async def get_docs(query: str, library: str, ctx: Context, max_chars: int = DOCS_MAX_CHARS):
   """
   Search the latest docs for a given query and library.
   Supports langchain, openai, and llama-index.
@@ -54,23 +216,52 @@ async def get_docs(query: str, library: str):
   Args:
     query: The query to search for (e.g. "Chroma DB")
     library: The library to search in (e.g. "langchain")
+    max_chars: Maximum size of the returned text
 
   Returns:
-    Text from the docs
+    The passages of the docs most relevant to the query, with their source URLs
+
+  Progress notifications are sent while the tool runs; once a page has been
+  fetched, its notification message is a JSON object carrying the url and the
+  page's most relevant passages, so clients can show partial results early.
   """
   if library not in docs_urls:
     raise ValueError(f"Library {library} not supported by this tool")
   
-  query = f"site:{docs_urls[library]} {query}"
-  results = await search_web(query)
+  site_query = f"site:{docs_urls[library]} {query}"
+  results = await search_web(site_query)
   if len(results["organic"]) == 0:
     return "No results found"
-  
-  text = ""
-  for result in results["organic"]:
-    text += await fetch_url(result["link"])
+
+  urls = [result["link"] for result in results["organic"]]
+  fetched = 0
+  await ctx.report_progress(0, len(urls), message=json.dumps({"stage": "searched", "urls": urls}))
+
+  async def on_page(url: str, page: str):
+    nonlocal fetched
+    fetched += 1
+    partial = format_chunks(select_chunks([(url, page)], query, max_chars // len(urls), chunk_size=DOCS_CHUNK_SIZE))
+    await ctx.report_progress(
+        fetched, len(urls), message=json.dumps({"stage": "page", "url": url, "text": partial})
+    )
+
+  pages = await fetch_all(urls, on_page=on_page)
+  chunks = select_chunks(pages, query, max_chars, chunk_size=DOCS_CHUNK_SIZE)
+  text = format_chunks(chunks)
+
+  full_size = sum(len(page) for _, page in pages)
+  logger.info(
+      f"get_docs returned {len(text)} of {full_size} chars "
+      f"({100 * (1 - len(text) / full_size) if full_size else 0:.0f}% reduction)"
+  )
   return text
 
 
+@mcp.resource("cache://stats")
+async def cache_stats() -> str:
+  """Hit rates and sizes of the page and search result caches."""
+  return json.dumps({"pages": await page_cache.metrics(), "searches": await search_cache.metrics()}, indent=2)
+
+
 if __name__ == "__main__":
     mcp.run(transport="stdio")
\ No newline at end of file
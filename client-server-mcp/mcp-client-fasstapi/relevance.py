@@ -0,0 +1,120 @@
+import math
+import re
+from collections import Counter
+
+_WORD = re.compile(r"[a-z0-9_]+")
+SEPARATOR = "\n\n"
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "i",
+    "in", "is", "it", "of", "on", "or", "that", "the", "this", "to", "with", "you",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    return [word for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def chunk_text(text: str, chunk_size: int = 1200) -> list[str]:
+    """Split text into chunks of roughly `chunk_size` characters on paragraph boundaries."""
+    chunks, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        # Hard-split paragraphs that are bigger than a chunk on their own
+        while len(paragraph) > chunk_size:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:chunk_size])
+            paragraph = paragraph[chunk_size:]
+        if current and len(current) + len(paragraph) + 2 > chunk_size:
+            chunks.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def bm25_scores(query: str, documents: list[str], k1: float = 1.5, b: float = 0.75) -> list[float]:
+    query_terms = set(tokenize(query))
+    tokenized = [tokenize(doc) for doc in documents]
+    if not query_terms or not tokenized:
+        return [0.0] * len(documents)
+
+    avg_len = sum(len(tokens) for tokens in tokenized) / len(tokenized) or 1.0
+    doc_freq = Counter(term for tokens in tokenized for term in set(tokens) & query_terms)
+    n = len(tokenized)
+
+    scores = []
+    for tokens in tokenized:
+        counts = Counter(tokens)
+        score = 0.0
+        for term in query_terms:
+            tf = counts.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(tokens) / avg_len))
+        scores.append(score)
+    return scores
+
+
+def select_chunks(pages: list[tuple[str, str]], query: str, max_chars: int,
+                  chunk_size: int = 1200) -> list[tuple[str, str]]:
+    """Pick the chunks of `pages` most relevant to `query` that fit in `max_chars`
+    once joined by `format_chunks`.
+
+    `pages` is a list of (url, text) pairs. The selected (url, chunk) pairs are
+    returned in their original page order, so neighbouring chunks read naturally.
+    """
+    candidates = [
+        (url, chunk)
+        for url, text in pages
+        for chunk in chunk_text(text, chunk_size)
+    ]
+    scores = bm25_scores(query, [chunk for _, chunk in candidates])
+    ranked = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+
+    # Count the text exactly as format_chunks lays it out: every section is
+    # preceded by a separator except the first, and each source gets a header
+    selected, used, sources = [], -len(SEPARATOR), set()
+    for i in ranked:
+        url, chunk = candidates[i]
+        size = len(SEPARATOR) + len(chunk)
+        if url not in sources:
+            size += len(SEPARATOR) + len(source_header(url))
+        if used + size > max_chars:
+            continue
+        selected.append(i)
+        sources.add(url)
+        used += size
+
+    if not selected:
+        # Every chunk is bigger than the budget: return the start of the best
+        # one whose source header fits
+        for i in ranked:
+            url, chunk = candidates[i]
+            room = max_chars - len(SEPARATOR) - len(source_header(url))
+            if room > 0:
+                return [(url, chunk[:room].rstrip())]
+    return [candidates[i] for i in sorted(selected)]
+
+
+def source_header(url: str) -> str:
+    return f"Source: {url}"
+
+
+def format_chunks(chunks: list[tuple[str, str]]) -> str:
+    """Join (url, chunk) pairs into one text, with a header wherever the source changes."""
+    sections = []
+    current_url = None
+    for url, chunk in chunks:
+        if url != current_url:
+            sections.append(source_header(url))
+            current_url = url
+        sections.append(chunk)
+    return SEPARATOR.join(sections)
@@ -15,6 +15,16 @@ embedding = OllamaEmbeddings(model="mxbai-embed-large")
 db_loc = "./chroma_db"
 add_doc = not os.path.exists(db_loc)
 
+# HNSW index settings: higher M / construction_ef improve recall at the cost of
+# build time and memory, search_ef trades query latency for recall.
+# M and construction_ef only apply when the collection is first created.
+hnsw_config = {
+    "hnsw:space": os.getenv("HNSW_SPACE", "l2"),
+    "hnsw:M": int(os.getenv("HNSW_M", "16")),
+    "hnsw:construction_ef": int(os.getenv("HNSW_CONSTRUCTION_EF", "100")),
+    "hnsw:search_ef": int(os.getenv("HNSW_SEARCH_EF", "10")),
+}
+
 # List to store documents
 if add_doc:
     documents = []
@@ -30,7 +40,8 @@ if add_doc:
 vector_store = Chroma(
     collection_name="qna",
     persist_directory=db_loc,
-    embedding_function=embedding
+    embedding_function=embedding,
+    collection_metadata=hnsw_config
 )
 
 # Add documents to the vector store, if applicable
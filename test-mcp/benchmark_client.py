@@ -0,0 +1,106 @@
+"""Benchmark the Gemini agent loop against a local stub model.
+
+The stub answers the Gemini generateContent API and the NWS alerts API: for
+every query it asks for `get_alert` on several states at once, then answers
+with text once the results come back. NWS responses are delayed, so the time
+per query shows whether the tool calls of a step overlap.
+
+    python benchmark_client.py --queries 10 --states 4 --tool-delay 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("GOOGLE_API_KEY", "stub")
+
+from client import MCPClient
+
+STATES = ["CA", "NY", "TX", "FL", "WA", "IL", "CO", "AZ"]
+
+
+def stub_handler(states: list[str], model_delay: float, tool_delay: float):
+    class StubHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            # NWS alerts for one state
+            time.sleep(tool_delay)
+            self.send_json({"features": []})
+
+        def do_POST(self):
+            # Gemini generateContent
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(model_delay)
+            last_parts = body["contents"][-1]["parts"]
+            if any("functionResponse" in part for part in last_parts):
+                parts = [{"text": "No active alerts in any of those states."}]
+            else:
+                parts = [
+                    {"functionCall": {"name": "get_alert", "args": {"state": state}}}
+                    for state in states
+                ]
+            self.send_json({
+                "candidates": [{"content": {"role": "model", "parts": parts}, "finishReason": "STOP"}],
+                "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 5, "totalTokenCount": 15},
+            })
+
+    return StubHandler
+
+
+async def run(args, stub_url: str):
+    client = MCPClient(base_url=stub_url)
+    server_env = {**os.environ, "NWS_API_BASE": stub_url}
+    try:
+        await client.connect_to_server(args.server, env=server_env)
+        latencies = []
+        for i in range(args.queries):
+            start = time.perf_counter()
+            await client.process_query(f"Any weather alerts? ({i})")
+            latencies.append(time.perf_counter() - start)
+    finally:
+        await client.cleanup()
+
+    latencies.sort()
+    # one step with tools plus the final answer
+    floor = 2 * args.model_delay + args.tool_delay
+    sequential = 2 * args.model_delay + args.states * args.tool_delay
+    print(f"{args.queries} queries, {args.states} tool calls each")
+    print(f"median {latencies[len(latencies) // 2]:.3f}s  max {latencies[-1]:.3f}s")
+    print(f"lower bound with concurrent tools {floor:.3f}s, sequential {sequential:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server", default="./server.py")
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--states", type=int, default=4, choices=range(1, len(STATES) + 1))
+    parser.add_argument("--model-delay", type=float, default=0.05)
+    parser.add_argument("--tool-delay", type=float, default=0.3)
+    args = parser.parse_args()
+
+    stub = ThreadingHTTPServer(
+        ("127.0.0.1", 0), stub_handler(STATES[:args.states], args.model_delay, args.tool_delay)
+    )
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    try:
+        asyncio.run(run(args, f"http://127.0.0.1:{stub.server_port}"))
+    finally:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 import asyncio
+import sys
 from typing import Optional
 from contextlib import AsyncExitStack
 
-from mcp import ClientSession, StdioServerParameters
+from mcp import ClientSession, StdioServerParameters, types as mcp_types
 from mcp.client.stdio import stdio_client
 
 from google import genai
@@ -14,22 +15,109 @@ load_dotenv()
 
 os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
 
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+# Point the client at another endpoint, e.g. a local stub model for benchmarks
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+# Maximum model calls per query, so a model that keeps calling tools can't loop forever
+MAX_TOOL_STEPS = int(os.getenv("MAX_TOOL_STEPS", "8"))
+
+# GEMINI_UNSUPPORTED_KEYS, SCHEMA_KEYS, SCHEMA_LIST_KEYS and gemini_schema are
+# duplicated in client-server-mcp/mcp-client-fasstapi/api/tool_catalogue.py; the projects are installed separately, so
+# apply any fix to both copies
+
+# JSON Schema keywords Gemini function declarations do not accept
+GEMINI_UNSUPPORTED_KEYS = {"$schema", "$defs", "$ref", "title", "default", "examples", "additionalProperties"}
+
+
+# Keywords whose value is a schema, or a list of schemas
+SCHEMA_KEYS = {"items", "not"}
+SCHEMA_LIST_KEYS = {"anyOf", "oneOf", "allOf", "prefixItems"}
+
+
+def gemini_schema(schema, defs=None, seen=()):
+    """Strip an MCP tool input schema down to what Gemini accepts
+
+    `$ref`s are inlined, and keywords are only stripped where a schema is
+    expected, never from property names.
+    """
+    if not isinstance(schema, dict):
+        return schema
+    if defs is None:
+        defs = schema.get("$defs", {})
+
+    ref = schema.get("$ref")
+    if ref is not None:
+        name = ref.rsplit("/", 1)[-1]
+        if name in seen or name not in defs:
+            # Gemini has no way to express recursive types
+            return {"type": "object"}
+        siblings = {key: value for key, value in schema.items() if key != "$ref"}
+        return gemini_schema({**defs[name], **siblings}, defs, seen + (name,))
+
+    result = {}
+    for key, value in schema.items():
+        if key in GEMINI_UNSUPPORTED_KEYS:
+            continue
+        if key == "properties" and isinstance(value, dict):
+            result[key] = {name: gemini_schema(prop, defs, seen) for name, prop in value.items()}
+        elif key in SCHEMA_KEYS:
+            result[key] = gemini_schema(value, defs, seen)
+        elif key in SCHEMA_LIST_KEYS and isinstance(value, list):
+            result[key] = [gemini_schema(item, defs, seen) for item in value]
+        else:
+            result[key] = value
+    return result
 
 
 class MCPClient:
-    def __init__(self):
+    def __init__(self, model: str = GEMINI_MODEL, base_url: Optional[str] = GEMINI_BASE_URL, max_steps: int = MAX_TOOL_STEPS):
         # Initialize session and client objects
         self.session: Optional[ClientSession] = None
         self.exit_stack = AsyncExitStack()
-        
-    
-
-
-    async def connect_to_server(self, server_script_path: str):
+        # One async Gemini client for every query, so its connections are reused
+        http_options = types.HttpOptions(base_url=base_url) if base_url else None
+        self.gemini = genai.Client(http_options=http_options).aio
+        self.model = model
+        self.max_steps = max_steps
+        # Tool catalogue, listed once and translated per provider up front
+        self.tools: list[mcp_types.Tool] = []
+        self.anthropic_tools: list[dict] = []
+        self.gemini_tools: list[types.Tool] = []
+        self.gemini_config = types.GenerateContentConfig()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def refresh_tools(self):
+        """List the server's tools and cache their provider-specific schemas"""
+        response = await self.session.list_tools()
+        self.tools = response.tools
+        self.anthropic_tools = [{
+            "name": tool.name,
+            "description": tool.description,
+            "input_schema": tool.inputSchema
+        } for tool in self.tools]
+        self.gemini_tools = [types.Tool(function_declarations=[
+            types.FunctionDeclaration(
+                name=tool.name,
+                description=tool.description or "",
+                parameters=gemini_schema(tool.inputSchema) if tool.inputSchema.get("properties") else None,
+            )
+            for tool in self.tools
+        ])]
+        self.gemini_config = types.GenerateContentConfig(tools=self.gemini_tools if self.tools else None)
+
+    async def handle_server_message(self, message):
+        """Refresh the cached tools when the server reports a change"""
+        if isinstance(message, mcp_types.ServerNotification) and isinstance(message.root, mcp_types.ToolListChangedNotification):
+            # Requests can't be awaited from inside the session's receive loop
+            self._refresh_task = asyncio.create_task(self.refresh_tools())
+
+
+    async def connect_to_server(self, server_script_path: str, env: Optional[dict[str, str]] = None):
         """Connect to an MCP server
         
         Args:
             server_script_path: Path to the server script (.py or .js)
+            env: Environment for the server process, defaults to a minimal one
         """
         is_python = server_script_path.endswith('.py')
         is_js = server_script_path.endswith('.js')
@@ -40,94 +128,61 @@ class MCPClient:
         server_params = StdioServerParameters(
             command=command,
             args=[server_script_path],
-            env=None
+            env=env
         )
         
         stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
         self.stdio, self.write = stdio_transport
-        self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
+        self.session = await self.exit_stack.enter_async_context(
+            ClientSession(self.stdio, self.write, message_handler=self.handle_server_message)
+        )
         
         await self.session.initialize()
         
         # List available tools
-        response = await self.session.list_tools()
-        tools = response.tools
-        print("\nConnected to server with tools:", [tool.name for tool in tools])
+        await self.refresh_tools()
+        print("\nConnected to server with tools:", [tool.name for tool in self.tools])
+
+    async def call_tool(self, call: types.FunctionCall) -> dict:
+        """Run one function call on the MCP server and wrap the result for Gemini"""
+        try:
+            result = await self.session.call_tool(call.name, dict(call.args or {}))
+        except Exception as e:
+            return {"error": str(e)}
+        text = "\n".join(content.text for content in result.content if content.type == "text")
+        return {"error": text} if result.isError else {"result": text}
 
     async def process_query(self, query: str) -> str:
-        """Process a query using Claude and available tools"""
-        messages = [
-            {
-                "role": "user",
-                "content": query
-            }
-        ]
-
-        response = await self.session.list_tools()
-        available_tools = [{ 
-            "name": tool.name,
-            "description": tool.description,
-            "input_schema": tool.inputSchema
-        } for tool in response.tools]
-
-        # Initial Claude API call
-        # response = self.anthropic.messages.create(
-        #     model="claude-3-5-sonnet-20241022",
-        #     max_tokens=1000,
-        #     messages=messages,
-        #     tools=available_tools
-        # )
-        
-        client = genai.Client()
-        
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            
-                tools=available_tools,
-            
-        )
-
-        # Process response and handle tool calls
-        tool_results = []
+        """Process a query using Gemini and available tools"""
+        contents = [types.Content(role="user", parts=[types.Part.from_text(text=query)])]
         final_text = []
 
-        for content in response.content:
-            if content.type == 'text':
-                final_text.append(content.text)
-            elif content.type == 'tool_use':
-                tool_name = content.name
-                tool_args = content.input
-                
-                # Execute tool call
-                result = await self.session.call_tool(tool_name, tool_args)
-                tool_results.append({"call": tool_name, "result": result})
-                final_text.append(f"[Calling tool {tool_name} with args {tool_args}]")
-
-                # Continue conversation with tool results
-                if hasattr(content, 'text') and content.text:
-                    messages.append({
-                      "role": "assistant",
-                      "content": content.text
-                    })
-                messages.append({
-                    "role": "user", 
-                    "content": result.content
-                })
-
-                # Get next response from Claude
-                # response = self.anthropic.messages.create(
-                #     model="claude-3-5-sonnet-20240620",
-                #     max_tokens=1000,
-                #     messages=messages,
-                # )
-                
-                response = client.models.generate_content(
-                    model='gemini-2.0-flash',
-                    contents=messages
-                )
-                print(response.text)
-
-                final_text.append(response.content[0].text)
+        for _ in range(self.max_steps):
+            response = await self.gemini.models.generate_content(
+                model=self.model,
+                contents=contents,
+                config=self.gemini_config,
+            )
+            if not response.candidates or not response.candidates[0].content:
+                break
+            content = response.candidates[0].content
+            contents.append(content)
+            final_text.extend(part.text for part in content.parts or [] if part.text)
+
+            calls = response.function_calls
+            if not calls:
+                break
+
+            # Independent calls from the same turn run concurrently
+            for call in calls:
+                final_text.append(f"[Calling tool {call.name} with args {call.args}]")
+            results = await asyncio.gather(*(self.call_tool(call) for call in calls))
+            contents.append(types.Content(role="user", parts=[
+                types.Part.from_function_response(name=call.name, response=result)
+                for call, result in zip(calls, results)
+            ]))
+        else:
+            final_text.append(f"[Stopped after {self.max_steps} model calls]")
 
         return "\n".join(final_text)
 
@@ -164,5 +219,4 @@ async def main():
         await client.cleanup()
 
 if __name__ == "__main__":
-    import sys
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
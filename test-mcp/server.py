@@ -1,29 +1,133 @@
 from typing import Any 
+from contextlib import asynccontextmanager
+import os
+import re
+import time
+import json
+import asyncio
 import httpx
+from pydantic import BaseModel
 from mcp.server.fastmcp import FastMCP
 
-mcp = FastMCP("weather")
-
-NWS_API_BASE = "https://api.weather.gov"
+NWS_API_BASE = os.getenv("NWS_API_BASE", "https://api.weather.gov")
 USER_AGENT = "weather-app/1.0"
 
+# How long responses are cached when NWS sends no Cache-Control max-age
+DEFAULT_CACHE_TTL = 60.0
+# Gridpoints for a location practically never change
+POINTS_CACHE_TTL = 24 * 60 * 60.0
+# Maximum concurrent NWS requests made by one batch tool call
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
 
-async def make_nws_request(url:str)->dict[str,Any] | None:
-    """Make a request to the NWS API with proper error handling."""
-    
-    headers = {
-        "User-Agent": USER_AGENT,
-        "Accept": "application/geo+json"
-    }
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            res = await client.get(url,headers=headers,timeout=30.0)
-            res.raise_for_status()
-            return res.json()
-        except Exception:
+
+class TTLCache:
+    """A small in-memory cache whose entries expire after a per-entry TTL."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: dict[str, tuple[float, Any]] = {}
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        if len(self._entries) >= self.max_entries:
+            # drop expired entries first, then the oldest ones
+            now = time.monotonic()
+            self._entries = {k: v for k, v in self._entries.items() if v[0] >= now}
+            while len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+        self._entries[key] = (time.monotonic() + ttl, value)
+
+
+response_cache = TTLCache()
+points_cache = TTLCache(max_entries=4096)
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared client, so connections to the NWS API are pooled and kept alive."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            headers={
+                "User-Agent": USER_AGENT,
+                "Accept": "application/geo+json"
+            },
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=20),
+        )
+    return _client
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    global _client
+    try:
+        yield
+    finally:
+        if _client is not None:
+            await _client.aclose()
+            _client = None
+
+
+mcp = FastMCP("weather", lifespan=lifespan)
+
+
+def cache_ttl(res: httpx.Response, default: float) -> float:
+    """TTL allowed by the response's Cache-Control header."""
+    cache_control = res.headers.get("Cache-Control", "").lower()
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0.0
+    match = re.search(r"(?:s-maxage|max-age)=(\d+)", cache_control)
+    return float(match.group(1)) if match else default
+
+
+async def make_nws_request(url:str, default_ttl:float = DEFAULT_CACHE_TTL)->dict[str,Any] | None:
+    """Make a request to the NWS API with proper error handling.
+
+    Successful responses are cached for as long as their Cache-Control
+    header allows, or `default_ttl` seconds if it doesn't say.
+    """
+    cached = response_cache.get(url)
+    if cached is not None:
+        return cached
+
+    try:
+        res = await get_client().get(url)
+        res.raise_for_status()
+        data = res.json()
+    except Exception:
+        return None
+
+    ttl = cache_ttl(res, default_ttl)
+    if ttl > 0:
+        response_cache.set(url, data, ttl)
+    return data
+
+
+async def get_forecast_url(latitude: float, longitude: float) -> str | None:
+    """Look up the forecast endpoint of the gridpoint covering a location."""
+    # NWS itself only resolves points to 4 decimal places
+    key = f"{latitude:.4f},{longitude:.4f}"
+    forecast_url = points_cache.get(key)
+    if forecast_url is None:
+        points_data = await make_nws_request(f"{NWS_API_BASE}/points/{key}")
+        if not points_data:
             return None
-        
+        forecast_url = points_data["properties"]["forecast"]
+        points_cache.set(key, forecast_url, POINTS_CACHE_TTL)
+    return forecast_url
+
+
 def format_alert(feature:dict) -> str:
     """Format an alert feature into a readable string."""
     props = feature["properties"]
@@ -36,49 +140,146 @@ def format_alert(feature:dict) -> str:
         Instructions: {props.get('instruction', 'No specific instructions provided')}
         """
 
+SEVERITY_LEVELS = ["Unknown", "Minor", "Moderate", "Severe", "Extreme"]
+
+# Alert fields available in compact mode, mapped to NWS property names
+ALERT_FIELDS = {
+    "event": "event",
+    "severity": "severity",
+    "urgency": "urgency",
+    "certainty": "certainty",
+    "headline": "headline",
+    "description": "description",
+    "instruction": "instruction",
+    "effective": "effective",
+    "expires": "expires",
+    "sender": "senderName",
+}
+DEFAULT_ALERT_FIELDS = ["event", "severity", "headline", "expires"]
+
+
+def severity_rank(severity: str | None) -> int:
+    return SEVERITY_LEVELS.index(severity) if severity in SEVERITY_LEVELS else 0
+
+
+def compact_json(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def compact_alerts(state: str, features: list[dict], fields: list[str], max_chars: int | None) -> dict:
+    """Merge alerts that only differ by area and keep the selected fields.
+
+    The most severe alerts come first; once `max_chars` of JSON is reached the
+    remaining alerts are left out and counted in `omitted`. The summary fields
+    are always returned, even if they alone exceed `max_chars`.
+    """
+    merged: dict[tuple, dict] = {}
+    for feature in features:
+        props = feature["properties"]
+        key = (props.get("event"), props.get("severity"), props.get("headline"), props.get("description"))
+        if key not in merged:
+            merged[key] = {field: props.get(ALERT_FIELDS[field]) for field in fields}
+            merged[key]["areas"] = []
+        merged[key]["areas"].extend(
+            area.strip() for area in (props.get("areaDesc") or "").split(";") if area.strip()
+        )
+
+    alerts = sorted(merged.values(), key=lambda alert: -severity_rank(alert.get("severity")))
+    result = {"state": state, "count": len(alerts), "alerts": [], "omitted": 0}
+    # the omitted count may grow by a few digits once alerts are left out
+    size = len(compact_json(result)) + len(str(len(alerts)))
+    for i, alert in enumerate(alerts):
+        alert["areas"] = list(dict.fromkeys(alert["areas"]))
+        alert_size = len(compact_json(alert)) + 1
+        if max_chars is not None and size + alert_size > max_chars:
+            result["omitted"] = len(alerts) - i
+            break
+        result["alerts"].append(alert)
+        size += alert_size
+    return result
+
+
 @mcp.tool()
-async def get_alert(state:str)->str:
+async def get_alert(
+    state:str,
+    compact: bool = False,
+    min_severity: str | None = None,
+    fields: list[str] | None = None,
+    max_chars: int | None = None,
+)->str:
     """Get weather alerts for a US state.
 
     Args:
         state: Two-letter US state code (e.g. CA, NY)
+        compact: Return compact JSON instead of full text; identical alerts
+            issued for several areas are merged into one entry
+        min_severity: Only include alerts at least this severe
+            (Minor, Moderate, Severe or Extreme)
+        fields: Compact mode only. Alert fields to include, from event, severity,
+            urgency, certainty, headline, description, instruction, effective,
+            expires, sender. Defaults to event, severity, headline, expires
+        max_chars: Compact mode only. Maximum size of the result
     """
+    if min_severity and min_severity.capitalize() not in SEVERITY_LEVELS[1:]:
+        raise ValueError(
+            f"Unknown min_severity {min_severity!r}; use one of {', '.join(SEVERITY_LEVELS[1:])}"
+        )
+
     url = f"{NWS_API_BASE}/alerts/active/area/{state}"
     data = await make_nws_request(url)
     
     if not data or "features" not in data:
         return "Unable to fetch alerts or no alerts found."
+
+    features = data["features"]
+    if min_severity:
+        threshold = severity_rank(min_severity.capitalize())
+        features = [f for f in features if severity_rank(f["properties"].get("severity")) >= threshold]
+
+    if compact:
+        fields = [field for field in (fields or DEFAULT_ALERT_FIELDS) if field in ALERT_FIELDS]
+        return compact_json(compact_alerts(state.upper(), features, fields, max_chars))
     
-    alerts = [format_alert(feature) for feature in data["features"]]
+    alerts = [format_alert(feature) for feature in features]
     
     return "\n---\n".join(alerts)
 
 @mcp.tool()
-async def get_forecast(latitude: float, longitude: float) -> str:
+async def get_forecast(latitude: float, longitude: float, compact: bool = False, periods: int = 5) -> str:
     """Get weather forecast for a location.
 
     Args:
         latitude: Latitude of the location
         longitude: Longitude of the location
+        compact: Return compact JSON with the short forecast text only
+        periods: Number of forecast periods to include
     """
-    # First get the forecast grid endpoint
-    points_url = f"{NWS_API_BASE}/points/{latitude},{longitude}"
-    points_data = await make_nws_request(points_url)
+    # First get the forecast grid endpoint (cached per location)
+    forecast_url = await get_forecast_url(latitude, longitude)
 
-    if not points_data:
+    if not forecast_url:
         return "Unable to fetch forecast data for this location."
 
-    # Get the forecast URL from the points response
-    forecast_url = points_data["properties"]["forecast"]
     forecast_data = await make_nws_request(forecast_url)
 
     if not forecast_data:
         return "Unable to fetch detailed forecast."
 
+    upcoming = forecast_data["properties"]["periods"][:periods]
+    if compact:
+        return compact_json([
+            {
+                "name": period["name"],
+                "temperature": f"{period['temperature']}{period['temperatureUnit']}",
+                "wind": f"{period['windSpeed']} {period['windDirection']}",
+                "forecast": period["shortForecast"],
+            }
+            for period in upcoming
+        ])
+
     # Format the periods into a readable forecast
-    periods = forecast_data["properties"]["periods"]
     forecasts = []
-    for period in periods[:5]:  # Only show next 5 periods
+    for period in upcoming:
         forecast = f"""
 {period['name']}:
 Temperature: {period['temperature']}°{period['temperatureUnit']}
@@ -90,6 +291,87 @@ Forecast: {period['detailedForecast']}
     return "\n---\n".join(forecasts)
 
 
+class Location(BaseModel):
+    latitude: float
+    longitude: float
+
+
+async def gather_bounded(coros, limit: int = BATCH_CONCURRENCY) -> list:
+    """Run coroutines concurrently, at most `limit` at a time, keeping their order."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros))
+
+
+def format_alert_line(feature: dict) -> str:
+    """One-line summary of an alert, for combined multi-state results."""
+    props = feature["properties"]
+    return f"- {props.get('event', 'Unknown')} ({props.get('severity', 'Unknown')}): {props.get('areaDesc', 'Unknown')}"
+
+
+def format_period_line(period: dict) -> str:
+    return (
+        f"{period['name']}: {period['temperature']}°{period['temperatureUnit']}, "
+        f"wind {period['windSpeed']} {period['windDirection']}, {period['shortForecast']}"
+    )
+
+
+@mcp.tool()
+async def get_alerts_batch(states: list[str]) -> str:
+    """Get a summary of weather alerts for several US states in one call.
+
+    Args:
+        states: Two-letter US state codes (e.g. ["CA", "NY", "TX"])
+    """
+    states = list(dict.fromkeys(state.strip().upper() for state in states))
+    results = await gather_bounded(
+        make_nws_request(f"{NWS_API_BASE}/alerts/active/area/{state}") for state in states
+    )
+
+    sections = []
+    for state, data in zip(states, results):
+        if not data or "features" not in data:
+            sections.append(f"{state}: unable to fetch alerts")
+        elif not data["features"]:
+            sections.append(f"{state}: no active alerts")
+        else:
+            lines = [format_alert_line(feature) for feature in data["features"]]
+            sections.append(f"{state} ({len(lines)} alerts):\n" + "\n".join(lines))
+    return "\n\n".join(sections)
+
+
+@mcp.tool()
+async def get_forecast_batch(locations: list[Location]) -> str:
+    """Get a short weather forecast for several locations in one call.
+
+    Args:
+        locations: Locations as objects with latitude and longitude
+    """
+    forecast_urls = await gather_bounded(
+        get_forecast_url(location.latitude, location.longitude) for location in locations
+    )
+
+    # Nearby locations often share a gridpoint; fetch each forecast only once
+    unique_urls = list(dict.fromkeys(url for url in forecast_urls if url))
+    forecasts = dict(zip(unique_urls, await gather_bounded(
+        make_nws_request(url) for url in unique_urls
+    )))
+
+    sections = []
+    for location, url in zip(locations, forecast_urls):
+        name = f"{location.latitude},{location.longitude}"
+        data = forecasts.get(url) if url else None
+        if not data:
+            sections.append(f"{name}: unable to fetch forecast")
+            continue
+        periods = data["properties"]["periods"][:2]  # Only the next 2 periods
+        sections.append(f"{name}:\n" + "\n".join(format_period_line(period) for period in periods))
+    return "\n\n".join(sections)
+
 
 if __name__ == "__main__":
     print("From runner...")